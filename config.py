@@ -5,18 +5,32 @@ Este módulo centraliza las rutas, constantes y configuraciones del proyecto.
 
 import os
 import platform
+import shutil
+import functools
 import logging
 from pathlib import Path
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("energia_pyomo.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configuración de logging (una sola vez por proceso)
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_root_logger = logging.getLogger()
+if not _root_logger.handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[
+            logging.FileHandler("energia_pyomo.log"),
+            logging.StreamHandler()
+        ]
+    )
+elif not any(isinstance(h, logging.FileHandler) for h in _root_logger.handlers):
+    # Otro módulo configuró el logging antes: basicConfig no haría nada y se perdería el archivo de log
+    _file_handler = logging.FileHandler("energia_pyomo.log")
+    _file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _file_handler.setLevel(logging.INFO)
+    _root_logger.addHandler(_file_handler)
+    # Si se configuró con un nivel más alto, los mensajes INFO no llegarían al archivo
+    if _root_logger.getEffectiveLevel() > logging.INFO:
+        _root_logger.setLevel(logging.INFO)
 
 logger = logging.getLogger(__name__)
 
@@ -37,24 +51,21 @@ RESULTADO_OFERTAS = OUTPUT_DIR / "resultado_ofertas.xlsx"
 ESTADISTICAS_OFERTAS = OUTPUT_DIR / "estadisticas_ofertas.xlsx"
 
 # Detectar sistema operativo y configurar el solver de Pyomo
+# (rutas candidatas por plataforma, en orden de preferencia)
 SYSTEM = platform.system()
 if SYSTEM == "Windows":
-    CBC_PATH = BASE_DIR / "CBC" / "cbc.exe"
+    CBC_CANDIDATOS = (BASE_DIR / "CBC" / "cbc.exe",)
 elif SYSTEM == "Darwin":  # macOS
-    # Usar homebrew installation path como predeterminado
-    CBC_PATH = Path("/usr/local/bin/cbc")
-    if not CBC_PATH.exists():
-        # Alternativas comunes en macOS
-        alternatives = [
-            Path("/opt/homebrew/bin/cbc"),
-            Path("/opt/local/bin/cbc")
-        ]
-        for alt in alternatives:
-            if alt.exists():
-                CBC_PATH = alt
-                break
+    # Usar homebrew installation path como predeterminado, luego alternativas comunes
+    CBC_CANDIDATOS = (
+        Path("/usr/local/bin/cbc"),
+        Path("/opt/homebrew/bin/cbc"),
+        Path("/opt/local/bin/cbc")
+    )
 else:  # Linux y otros
-    CBC_PATH = Path("/usr/bin/cbc")
+    CBC_CANDIDATOS = (Path("/usr/bin/cbc"),)
+
+CBC_PATH = next((ruta for ruta in CBC_CANDIDATOS if ruta.exists()), CBC_CANDIDATOS[0])
 
 # Verificar existencia del solver
 if not CBC_PATH.exists():
@@ -64,13 +75,17 @@ if not CBC_PATH.exists():
 # Constantes del modelo
 DEFAULT_K_FACTOR = 1.5  # Factor k por defecto para la evaluación de ofertas
 
+@functools.lru_cache(maxsize=1)
 def get_solver_path():
-    """Retorna la ruta al solver CBC, considerando el sistema operativo."""
+    """
+    Retorna la ruta al solver CBC, considerando el sistema operativo.
+    
+    La ruta se resuelve una sola vez y se reutiliza en llamadas posteriores.
+    """
     if CBC_PATH.exists():
         return str(CBC_PATH)
     else:
         # Intentar encontrar el solver en el PATH del sistema
-        import shutil
         cbc_in_path = shutil.which("cbc")
         if cbc_in_path:
             return cbc_in_path
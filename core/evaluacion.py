@@ -3,13 +3,266 @@ Módulo para evaluación de ofertas y preparación para optimización.
 Incluye funciones para evaluar ofertas y preparar datos para el modelo de optimización.
 """
 
+import re
+from datetime import datetime
+from functools import lru_cache
 import pandas as pd
+import numpy as np
 import logging
 from pathlib import Path
-from core.utils import verificar_archivo_existe, leer_excel_seguro
+from openpyxl import Workbook, load_workbook
+from core.utils import verificar_archivo_existe, leer_excel_seguro, abrir_libro_salida, escribir_hoja_df
 
 logger = logging.getLogger(__name__)
 
+# Columnas horarias (1 a 24) de las hojas pivotadas, creadas una sola vez
+_HORAS_INDEX = pd.Index(range(1, 25), dtype="int16")
+
+# Columnas de la hoja de ofertas que usan la evaluación y el modelo de optimización
+_COLUMNAS_OFERTAS = frozenset((
+    "CÓDIGO OFERTA", "FECHA", "Atributo", "CANTIDAD", "PRECIO", "PRECIO INDEXADO", "EVALUACIÓN"
+))
+
+# Columnas requeridas para filtrar las ofertas válidas
+_COLUMNAS_FILTRO = frozenset(("CANTIDAD", "PRECIO INDEXADO"))
+
+# Tipos compactos aplicados a las ofertas válidas
+_TIPOS_COMPACTOS = {"CÓDIGO OFERTA": "category", "Atributo": "int16", "EVALUACIÓN": "int8"}
+
+# Claves de resultados por oferta: 'DEMANDA ASIGNADA {oferta} IT{n}_{COMPRAR|NO_COMPRADA}'
+_PATRON_HOJA_ASIGNADA = re.compile(r"DEMANDA ASIGNADA (.+) IT(\d*)_(COMPRAR|NO_COMPRADA)$")
+
+# Columnas de las hojas de resultados: X (fecha DD/MM/YYYY o título) y horas 1 a 24
+_COLUMNAS_RESULTADO = ["X", *range(1, 25)]
+
+# Horas vacías de la fila de título de los cuadros de resultados
+_HORAS_VACIAS = (None,) * 24
+
+def _cuadro_con_titulo(texto, df):
+    """
+    Prepara los datos de una hoja de resultados y la fila de título del cuadro.
+    
+    La fila de título se escribe aparte, entre el encabezado y los datos, sin apilarla
+    sobre el DataFrame. Las columnas quedan como X y horas 1 a 24, seguidas de
+    cualquier otra columna de df.
+    
+    Args:
+        texto (str): Título que se escribe en la columna X
+        df (DataFrame): Datos del cuadro
+        
+    Returns:
+        tuple: (DataFrame con las columnas de resultados, fila de título con las horas vacías)
+    """
+    extras = [col for col in df.columns if col not in _COLUMNAS_RESULTADO]
+    return df.reindex(columns=_COLUMNAS_RESULTADO + extras), (texto, *_HORAS_VACIAS, *(None,) * len(extras))
+
+@lru_cache(maxsize=4096)
+def _etiqueta_fecha(fecha_ns):
+    """
+    Texto DD/MM/YYYY de una fecha dada en nanosegundos desde la época.
+    
+    Las hojas de una misma exportación comparten casi siempre el mismo rango de fechas,
+    así que cada fecha se formatea una sola vez y luego se toma de la caché.
+    
+    Args:
+        fecha_ns (int): Fecha como entero de nanosegundos (datetime64[ns])
+        
+    Returns:
+        str: Fecha con formato DD/MM/YYYY
+    """
+    fecha = pd.Timestamp(fecha_ns)
+    return f"{fecha.day:02d}/{fecha.month:02d}/{fecha.year:04d}"
+
+def _formatear_fechas(fechas):
+    """
+    Convierte una serie de fechas a texto con formato DD/MM/YYYY.
+    
+    Cada fecha distinta se formatea una sola vez (ver _etiqueta_fecha); si hay fechas
+    nulas se usa dt.strftime, que las deja como NaN.
+    
+    Args:
+        fechas (Series): Fechas (date, datetime o Timestamp)
+        
+    Returns:
+        Series: Fechas como texto, con el mismo índice
+    """
+    fechas = pd.to_datetime(fechas)
+    if fechas.hasnans:
+        return fechas.dt.strftime('%d/%m/%Y')
+    
+    valores_ns = fechas.to_numpy(dtype="datetime64[ns]").view("int64").tolist()
+    return pd.Series([_etiqueta_fecha(valor) for valor in valores_ns], index=fechas.index, dtype=object)
+
+def _escribir_hojas_excel(archivo, hojas):
+    """
+    Escribe varias hojas en un archivo Excel abriéndolo y guardándolo una sola vez.
+    
+    Si el archivo existe se reemplazan las hojas con el mismo nombre y se conservan las
+    demás; si no existe, las hojas se escriben en un libro de solo escritura.
+    
+    Args:
+        archivo (str o Path): Ruta del archivo Excel
+        hojas (list): Tuplas (nombre de hoja, DataFrame, fila de título o None) en el orden
+            en que se escriben
+    """
+    libro = abrir_libro_salida(archivo)
+    for nombre_hoja, df_hoja, fila_titulo in hojas:
+        escribir_hoja_df(libro, nombre_hoja, df_hoja, fila_titulo=fila_titulo)
+    libro.save(archivo)
+
+def _agrupar_hojas_asignadas(resultados_dict):
+    """
+    Agrupa en una sola pasada las claves 'DEMANDA ASIGNADA {oferta} IT{n}_{tipo}' de los resultados.
+    
+    Args:
+        resultados_dict (dict): Diccionario con los DataFrames de resultados
+        
+    Returns:
+        dict: Por oferta, un diccionario {"COMPRAR": [...], "NO_COMPRADA": [...]} con pares
+            (número de iteración o None si no se puede leer, clave) en el orden de resultados_dict
+    """
+    hojas_por_oferta = {}
+    for clave in resultados_dict:
+        coincidencia = _PATRON_HOJA_ASIGNADA.match(clave)
+        if coincidencia is None:
+            continue
+        
+        oferta, iteracion, tipo = coincidencia.groups()
+        hojas = hojas_por_oferta.setdefault(oferta, {"COMPRAR": [], "NO_COMPRADA": []})
+        hojas[tipo].append((int(iteracion) if iteracion else None, clave))
+    
+    return hojas_por_oferta
+
+def _agrupar_ofertas_rechazadas(ofertas_df):
+    """
+    Cuenta los registros originales de CANTIDADES Y PRECIOS y agrupa por oferta los que
+    no cumplieron la evaluación de precio (EVALUACIÓN = 0).
+    
+    Args:
+        ofertas_df (DataFrame): Hoja CANTIDADES Y PRECIOS sin filtrar
+        
+    Returns:
+        tuple: (número de registros (oferta, fecha, hora) distintos,
+            dict {oferta: [{'FECHA', 'HORA', 'CANTIDAD', 'PRECIO'}, ...]} en el orden de la hoja)
+    """
+    columnas = ofertas_df.columns
+    if ofertas_df.empty or not {"CÓDIGO OFERTA", "FECHA", "Atributo"} <= set(columnas):
+        return 0, {}
+    
+    oferta = ofertas_df["CÓDIGO OFERTA"]
+    validas = ofertas_df[
+        oferta.notna() & (oferta != "") & ofertas_df["FECHA"].notna() & ofertas_df["Atributo"].notna()
+    ]
+    registros = int((~validas.duplicated(["CÓDIGO OFERTA", "FECHA", "Atributo"])).sum())
+    
+    # Las columnas ausentes se toman como 0, igual que con row.get
+    rechazadas = validas[validas["EVALUACIÓN"] == 0] if "EVALUACIÓN" in columnas else validas
+    if rechazadas.empty:
+        return registros, {}
+    
+    rechazadas = pd.DataFrame({
+        "CÓDIGO OFERTA": rechazadas["CÓDIGO OFERTA"],
+        "FECHA": rechazadas["FECHA"],
+        "HORA": rechazadas["Atributo"],
+        "CANTIDAD": rechazadas["CANTIDAD"] if "CANTIDAD" in columnas else 0,
+        "PRECIO": rechazadas["PRECIO INDEXADO"] if "PRECIO INDEXADO" in columnas else 0,
+    })
+    por_oferta = {
+        oferta: grupo.drop(columns="CÓDIGO OFERTA").to_dict("records")
+        for oferta, grupo in rechazadas.groupby("CÓDIGO OFERTA", sort=False, observed=True)
+    }
+    return registros, por_oferta
+
+def _leer_hoja_solo_lectura(archivo, nombre_hoja, columnas):
+    """
+    Lee una hoja recorriendo sus filas en modo de solo lectura de openpyxl.
+    
+    Args:
+        archivo (str o Path): Ruta al archivo Excel
+        nombre_hoja (str): Nombre de la hoja a leer
+        columnas (frozenset): Columnas del encabezado que se conservan
+        
+    Returns:
+        DataFrame: Datos de la hoja (sin filas vacías), o None si la hoja no existe
+    """
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        if nombre_hoja not in libro.sheetnames:
+            return None
+        
+        hoja = libro[nombre_hoja]
+        encabezado = next(hoja.iter_rows(max_row=1, values_only=True), ())
+        posiciones = [i for i, columna in enumerate(encabezado) if columna in columnas]
+        
+        # Con max_col las filas cortas se completan con None hasta el ancho del encabezado
+        filas = [
+            [fila[i] for i in posiciones]
+            for fila in hoja.iter_rows(min_row=2, max_col=len(encabezado), values_only=True)
+        ]
+    finally:
+        libro.close()
+    
+    df = pd.DataFrame(filas, columns=[encabezado[i] for i in posiciones])
+    return df.dropna(how="all").reset_index(drop=True)
+
+def _combinar_rechazadas(df_no_comprado, rechazadas):
+    """
+    Reemplaza en la energía no comprada las cantidades rechazadas por precio.
+    
+    Cada registro rechazado fija la cantidad de su fecha y hora (el último gana). Las
+    fechas que no están en df_no_comprado se agregan al final, en orden de aparición,
+    con cero en las demás horas.
+    
+    Args:
+        df_no_comprado (DataFrame): Energía no comprada con columnas FECHA y 1 a 24
+        rechazadas (list): Registros {'FECHA', 'HORA', 'CANTIDAD', ...} de la oferta
+        
+    Returns:
+        DataFrame: Nuevo DataFrame con las cantidades rechazadas incorporadas
+    """
+    # Cantidad final por fecha y hora
+    cantidades_por_fecha = {}
+    for item in rechazadas:
+        cantidades_por_fecha.setdefault(item['FECHA'], {})[item['HORA']] = item['CANTIDAD']
+    
+    # Posiciones de las filas existentes para cada fecha
+    filas_por_fecha = {}
+    for posicion, fecha in enumerate(df_no_comprado['FECHA'].tolist()):
+        filas_por_fecha.setdefault(fecha, []).append(posicion)
+    
+    # Separar las actualizaciones por hora ({hora: (posiciones, cantidades)}) de las filas nuevas
+    cambios_por_hora = {}
+    nuevas_filas = []
+    for fecha, cantidades in cantidades_por_fecha.items():
+        posiciones = filas_por_fecha.get(fecha)
+        if posiciones is None:
+            nueva_fila = {'FECHA': fecha, **dict.fromkeys(range(1, 25), 0)}
+            nueva_fila.update(cantidades)
+            nuevas_filas.append(nueva_fila)
+            continue
+        
+        for hora, cantidad in cantidades.items():
+            filas, valores = cambios_por_hora.setdefault(hora, ([], []))
+            filas.extend(posiciones)
+            valores.extend([cantidad] * len(posiciones))
+    
+    df_total = df_no_comprado.copy()
+    for hora, (filas, valores) in cambios_por_hora.items():
+        if hora in df_total.columns:
+            columna = df_total[hora].to_numpy()
+        else:
+            columna = np.full(len(df_total), np.nan)
+        valores = np.asarray(valores)
+        columna = columna.astype(np.result_type(columna, valores))
+        columna[filas] = valores
+        df_total[hora] = columna
+    
+    # Añadir todas las filas nuevas con un solo concat
+    if nuevas_filas:
+        df_total = pd.concat([df_total, pd.DataFrame(nuevas_filas)], ignore_index=True)
+    
+    return df_total
+
 def evaluar_ofertas_para_optimizacion(archivo_ofertas):
     """
     Lee el archivo de ofertas y prepara los datos para la optimización.
@@ -45,87 +298,97 @@ def calcular_estadisticas_ofertas(ofertas_df):
         logger.warning("No hay ofertas para calcular estadísticas")
         return pd.DataFrame()
     
-    stats = []
+    partes = []
     
-    # Estadísticas por oferta
-    for oferta in ofertas_df["CÓDIGO OFERTA"].unique():
-        if oferta == "SIN ASIGNACIÓN":
-            continue
-            
-        df_of = ofertas_df[ofertas_df["CÓDIGO OFERTA"] == oferta]
-        
-        # Determinar la columna que contiene la asignación (podría ser CANTIDAD o ENERGÍA ASIGNADA)
-        if "ENERGÍA ASIGNADA" in df_of.columns:
-            total_asignado = df_of["ENERGÍA ASIGNADA"].sum()
-            precio_columna = "PRECIO"
-        else:
-            total_asignado = df_of["CANTIDAD"].sum()
-            precio_columna = "PRECIO INDEXADO"
+    # Resolver una sola vez qué columnas trae el DataFrame
+    columnas = set(ofertas_df.columns)
+    tiene_energia = "ENERGÍA ASIGNADA" in columnas
+    
+    # Determinar la columna que contiene la asignación (podría ser CANTIDAD o ENERGÍA ASIGNADA)
+    if tiene_energia:
+        valor_columna = "ENERGÍA ASIGNADA"
+        precio_columna = "PRECIO"
+    else:
+        valor_columna = "CANTIDAD"
+        precio_columna = "PRECIO INDEXADO"
+    
+    # Filas con oferta asignada: la máscara se calcula una sola vez y se reutiliza
+    asignada = ofertas_df["CÓDIGO OFERTA"] != "SIN ASIGNACIÓN"
+    
+    # Estadísticas por oferta: sumas por código entero de oferta con np.bincount
+    df_asignado = ofertas_df[asignada]
+    codigos, ofertas = pd.factorize(df_asignado["CÓDIGO OFERTA"])
+    con_codigo = codigos >= 0
+    codigos = codigos[con_codigo]
+    asignacion = df_asignado[valor_columna].to_numpy(dtype=float)[con_codigo]
+    
+    # Solo cuentan para el promedio ponderado las filas con precio y asignación positiva
+    if precio_columna in columnas:
+        precio = df_asignado[precio_columna].to_numpy(dtype=float)[con_codigo]
+        validas = ~np.isnan(precio) & (asignacion > 0)
+        ingreso = np.where(validas, precio * asignacion, 0.0)
+        asignacion_ponderada = np.where(validas, asignacion, 0.0)
+    else:
+        ingreso = asignacion_ponderada = np.zeros(len(codigos))
+    
+    if len(ofertas) > 0:
+        total_asignado = np.bincount(codigos, weights=np.nan_to_num(asignacion), minlength=len(ofertas))
+        ingreso = np.bincount(codigos, weights=ingreso, minlength=len(ofertas))
+        asignacion_ponderada = np.bincount(codigos, weights=asignacion_ponderada, minlength=len(ofertas))
+        precio_promedio = np.divide(
+            ingreso, asignacion_ponderada,
+            out=np.zeros(len(ofertas)), where=asignacion_ponderada > 0
+        )
         
-        precio_promedio = 0
+        costo_total = total_asignado * precio_promedio
         
-        # Calcular precio promedio ponderado
-        if precio_columna in df_of.columns and not df_of[precio_columna].isnull().all():
-            precio_ponderado_sum = 0
-            asignacion_sum = 0
-            
-            for _, row in df_of.iterrows():
-                precio = row.get(precio_columna, 0)
-                asignacion = row.get("ENERGÍA ASIGNADA" if "ENERGÍA ASIGNADA" in df_of.columns else "CANTIDAD", 0)
-                
-                if pd.notna(precio) and pd.notna(asignacion) and asignacion > 0:
-                    precio_ponderado_sum += precio * asignacion
-                    asignacion_sum += asignacion
-            
-            precio_promedio = precio_ponderado_sum / asignacion_sum if asignacion_sum > 0 else 0
-        
-        stats.append({
+        partes.append(pd.DataFrame({
             "TIPO": "OFERTA",
-            "IDENTIFICADOR": oferta,
+            "IDENTIFICADOR": np.asarray(ofertas, dtype=object),
             "TOTAL ASIGNADO (kWh)": total_asignado,
             "PRECIO PROMEDIO": precio_promedio,
-            "COSTO TOTAL": total_asignado * precio_promedio
-        })
-    
-    # Estadísticas generales
-    if stats:
-        total_general = sum(s["TOTAL ASIGNADO (kWh)"] for s in stats)
-        costo_general = sum(s["COSTO TOTAL"] for s in stats)
+            "COSTO TOTAL": costo_total
+        }))
+        
+        # Estadísticas generales: sumas directas sobre los arreglos por oferta
+        total_general = total_asignado.sum()
+        costo_general = costo_total.sum()
         precio_promedio_general = costo_general / total_general if total_general > 0 else 0
         
-        stats.append({
+        partes.append(pd.DataFrame([{
             "TIPO": "TOTAL",
             "IDENTIFICADOR": "TODAS LAS OFERTAS",
             "TOTAL ASIGNADO (kWh)": total_general,
             "PRECIO PROMEDIO": precio_promedio_general,
             "COSTO TOTAL": costo_general
-        })
+        }]))
     
     # Estadísticas por fecha si existe la columna FECHA
-    if "FECHA" in ofertas_df.columns:
-        for fecha in ofertas_df["FECHA"].unique():
-            df_fecha = ofertas_df[ofertas_df["FECHA"] == fecha]
-            
-            if "ENERGÍA ASIGNADA" in df_fecha.columns:
-                total_cantidad = df_fecha[df_fecha["CÓDIGO OFERTA"] != "SIN ASIGNACIÓN"]["ENERGÍA ASIGNADA"].sum()
-                deficit = df_fecha["DÉFICIT"].sum() if "DÉFICIT" in df_fecha.columns else 0
-                demanda = df_fecha["DEMANDA TOTAL"].sum() if "DEMANDA TOTAL" in df_fecha.columns else total_cantidad
-            else:
-                total_cantidad = df_fecha["CANTIDAD"].sum()
-                deficit = 0
-                demanda = total_cantidad
-            
-            stats.append({
-                "TIPO": "FECHA",
-                "IDENTIFICADOR": fecha,
-                "TOTAL ASIGNADO (kWh)": total_cantidad,
-                "DEMANDA (kWh)": demanda,
-                "DÉFICIT (kWh)": deficit,
-                "COBERTURA (%)": (total_cantidad / demanda * 100) if demanda > 0 else 0
-            })
+    if "FECHA" in columnas:
+        if tiene_energia:
+            total_cantidad = ofertas_df["ENERGÍA ASIGNADA"].where(asignada, 0)
+            deficit = ofertas_df["DÉFICIT"] if "DÉFICIT" in columnas else 0
+            demanda = ofertas_df["DEMANDA TOTAL"] if "DEMANDA TOTAL" in columnas else total_cantidad
+        else:
+            total_cantidad = ofertas_df["CANTIDAD"]
+            deficit = 0
+            demanda = total_cantidad
+        
+        por_fecha = pd.DataFrame({
+            "TOTAL ASIGNADO (kWh)": total_cantidad,
+            "DEMANDA (kWh)": demanda,
+            "DÉFICIT (kWh)": deficit
+        }, index=ofertas_df.index).groupby(ofertas_df["FECHA"], sort=False).sum()
+        
+        por_fecha["COBERTURA (%)"] = (
+            por_fecha["TOTAL ASIGNADO (kWh)"] / por_fecha["DEMANDA (kWh)"].where(por_fecha["DEMANDA (kWh)"] > 0) * 100
+        ).fillna(0)
+        por_fecha.insert(0, "IDENTIFICADOR", por_fecha.index)
+        por_fecha.insert(0, "TIPO", "FECHA")
+        partes.append(por_fecha.reset_index(drop=True))
     
     logger.info("Estadísticas calculadas correctamente")
-    return pd.DataFrame(stats)
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
 
 def exportar_asignaciones_por_oferta(asignaciones_df, output_file):
     """
@@ -133,7 +396,8 @@ def exportar_asignaciones_por_oferta(asignaciones_df, output_file):
     
     Args:
         asignaciones_df (DataFrame): DataFrame con las asignaciones a exportar
-        output_file (str o Path): Ruta del archivo de salida
+        output_file (str, Path o Workbook): Ruta del archivo de salida, o un libro de openpyxl
+            ya abierto (p. ej. de solo escritura) al que se agregan las hojas sin guardarlo
         
     Returns:
         bool: True si la exportación fue exitosa, False en caso contrario
@@ -143,8 +407,8 @@ def exportar_asignaciones_por_oferta(asignaciones_df, output_file):
         return False
     
     try:
-        # Crear una copia del dataframe para no modificar el original
-        df = asignaciones_df.copy()
+        # El filtro y el pivot generan objetos nuevos, no hace falta copiar el original
+        df = asignaciones_df
         
         # Filtrar solo las filas con asignaciones (eliminar filas sin asignación)
         if "CÓDIGO OFERTA" in df.columns:
@@ -158,43 +422,48 @@ def exportar_asignaciones_por_oferta(asignaciones_df, output_file):
         hora_col = "HORA" if "HORA" in df.columns else "Atributo"
         valor_col = "ENERGÍA ASIGNADA" if "ENERGÍA ASIGNADA" in df.columns else "CANTIDAD"
         
-        # Usar ExcelWriter para crear/modificar el archivo
-        with pd.ExcelWriter(output_file, engine="openpyxl", mode="a", 
-                          if_sheet_exists="replace") as writer:
-            # Para cada oferta, crear una hoja
-            for oferta in df["CÓDIGO OFERTA"].unique():
-                df_oferta = df[df["CÓDIGO OFERTA"] == oferta].copy()
-                
-                # Pivotar los datos para tener fechas en filas y horas en columnas
-                pivot_df = df_oferta.pivot_table(
-                    index="FECHA", 
-                    columns=hora_col, 
-                    values=valor_col,
-                    fill_value=0
-                )
-                
-                # Asegurar que tenemos todas las columnas de 1 a 24
-                for hora in range(1, 25):
-                    if hora not in pivot_df.columns:
-                        pivot_df[hora] = 0
-                
-                # Ordenar las columnas
-                pivot_df = pivot_df.reindex(columns=range(1, 25))
-                
-                # Ordenar por fecha
-                pivot_df = pivot_df.sort_index()
-                
-                # Crear el nombre de la hoja
-                sheet_name = f"DEMANDA ASIGNADA {oferta}"
-                if len(sheet_name) > 31:  # Excel limita nombres de hojas a 31 caracteres
-                    sheet_name = sheet_name[:31]
-                
-                # Exportar a Excel
-                pivot_df.to_excel(writer, sheet_name=sheet_name)
-                logger.info(f"Hoja '{sheet_name}' creada en el archivo '{output_file}'")
+        # Pivotar una sola vez para todas las ofertas: (oferta, fecha) en filas y horas 1-24 en columnas.
+        # Hay un registro por oferta, fecha y hora, así que basta con reorganizar (sin agregar)
+        try:
+            pivot_todas = df.pivot(index=["CÓDIGO OFERTA", "FECHA"], columns=hora_col, values=valor_col)
+        except ValueError:
+            # Registros repetidos para la misma oferta, fecha y hora: se promedian
+            pivot_todas = df.pivot_table(
+                index=["CÓDIGO OFERTA", "FECHA"],
+                columns=hora_col,
+                values=valor_col,
+                observed=True
+            )
+        pivot_todas = pivot_todas.reindex(columns=_HORAS_INDEX, fill_value=0).fillna(0).sort_index()
+        
+        # Usar el libro recibido o abrir el archivo una sola vez para todas las hojas
+        libro = output_file if isinstance(output_file, Workbook) else abrir_libro_salida(output_file)
+        
+        # El pivot está ordenado por oferta y fecha, así que las filas de cada oferta forman
+        # un bloque contiguo: basta ubicar dónde empieza cada bloque
+        codigos = pivot_todas.index.codes[0]
+        codigos_oferta, inicios = np.unique(codigos, return_index=True)
+        finales = np.append(inicios[1:], len(codigos))
+        
+        # Para cada oferta, crear una hoja
+        for codigo, inicio, fin in zip(codigos_oferta, inicios, finales):
+            oferta = pivot_todas.index.levels[0][codigo]
+            pivot_df = pivot_todas.iloc[inicio:fin].droplevel("CÓDIGO OFERTA")
+            
+            # Crear el nombre de la hoja
+            sheet_name = f"DEMANDA ASIGNADA {oferta}"
+            if len(sheet_name) > 31:  # Excel limita nombres de hojas a 31 caracteres
+                sheet_name = sheet_name[:31]
             
-            # Exportar también la tabla de asignaciones completa
-            asignaciones_df.to_excel(writer, sheet_name="ASIGNACIONES", index=False)
+            # Exportar a Excel
+            escribir_hoja_df(libro, sheet_name, pivot_df, index=True)
+            logger.info("Hoja '%s' creada en el archivo '%s'", sheet_name, output_file)
+        
+        # Exportar también la tabla de asignaciones completa
+        escribir_hoja_df(libro, "ASIGNACIONES", asignaciones_df)
+        
+        if libro is not output_file:
+            libro.save(output_file)
         
         logger.info(f"Asignaciones exportadas correctamente a {output_file}")
         return True
@@ -208,7 +477,8 @@ def crear_hoja_demanda_faltante(asignaciones_df, output_file):
     
     Args:
         asignaciones_df (DataFrame): DataFrame con las asignaciones
-        output_file (str o Path): Ruta del archivo de salida
+        output_file (str, Path o Workbook): Ruta del archivo de salida, o un libro de openpyxl
+            ya abierto al que se agrega la hoja sin guardarlo
         
     Returns:
         bool: True si la operación fue exitosa, False en caso contrario
@@ -229,30 +499,24 @@ def crear_hoja_demanda_faltante(asignaciones_df, output_file):
             logger.info("No hay demanda faltante para reportar")
             
             # Crear mensaje de éxito
-            mensaje_df = pd.DataFrame({
+            df_faltante = pd.DataFrame({
                 "MENSAJE": ["No hay demanda faltante. Toda la demanda fue satisfecha."]
             })
-            
-            # Guardar en Excel
-            with pd.ExcelWriter(output_file, engine="openpyxl", mode="a", 
-                              if_sheet_exists="replace") as writer:
-                mensaje_df.to_excel(writer, sheet_name="DEMANDA FALTANTE", index=False)
-                logger.info(f"Hoja 'DEMANDA FALTANTE' creada en el archivo '{output_file}'")
-            
-            return True
         
         # Calcular porcentaje de déficit
-        if "DEMANDA TOTAL" in df_faltante.columns:
-            df_faltante["PORCENTAJE DÉFICIT"] = df_faltante.apply(
-                lambda row: (row["DÉFICIT"] / row["DEMANDA TOTAL"] * 100) if row["DEMANDA TOTAL"] > 0 else 0,
-                axis=1
-            )
+        elif "DEMANDA TOTAL" in df_faltante.columns:
+            # División vectorizada; las filas sin demanda quedan en 0
+            demanda_total = df_faltante["DEMANDA TOTAL"]
+            df_faltante = df_faltante.assign(**{
+                "PORCENTAJE DÉFICIT": (df_faltante["DÉFICIT"] / demanda_total.where(demanda_total > 0) * 100).fillna(0)
+            })
         
         # Guardar en Excel
-        with pd.ExcelWriter(output_file, engine="openpyxl", mode="a", 
-                          if_sheet_exists="replace") as writer:
-            df_faltante.to_excel(writer, sheet_name="DEMANDA FALTANTE", index=False)
-            logger.info(f"Hoja 'DEMANDA FALTANTE' creada en el archivo '{output_file}'")
+        libro = output_file if isinstance(output_file, Workbook) else abrir_libro_salida(output_file)
+        escribir_hoja_df(libro, "DEMANDA FALTANTE", df_faltante)
+        if libro is not output_file:
+            libro.save(output_file)
+        logger.info(f"Hoja 'DEMANDA FALTANTE' creada en el archivo '{output_file}'")
         
         return True
     except Exception as e:
@@ -276,53 +540,147 @@ def leer_ofertas_evaluadas(archivo_ofertas, sheet_name="CANTIDADES Y PRECIOS"):
             logger.error(f"No se encontró el archivo de ofertas: {archivo_ofertas}")
             return pd.DataFrame()
             
-        # Leer el archivo Excel
-        xls = pd.ExcelFile(archivo_ofertas)
-        if sheet_name not in xls.sheet_names:
+        # Leer el archivo Excel en modo de solo lectura, recorriendo solo la hoja pedida
+        # y conservando solo las columnas necesarias (las demás se descartarían después)
+        df = _leer_hoja_solo_lectura(archivo_ofertas, sheet_name, _COLUMNAS_OFERTAS)
+        if df is None:
             logger.error(f"No se encontró la hoja {sheet_name} en {archivo_ofertas}")
             return pd.DataFrame()
         
-        df = pd.read_excel(xls, sheet_name=sheet_name)
-        
         # Verificar que tengamos datos
         if df.empty:
             logger.warning(f"No hay datos en la hoja {sheet_name} de {archivo_ofertas}")
             return pd.DataFrame()
         
-        # Convertir tipos de datos
+        # Convertir tipos de datos en una sola asignación
+        conversiones = {}
         if "FECHA" in df.columns:
-            df['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce').dt.date
+            conversiones['FECHA'] = pd.to_datetime(df['FECHA'], errors='coerce').dt.date
         
         if "Atributo" in df.columns:
-            df['Atributo'] = df['Atributo'].astype(int)
+            conversiones['Atributo'] = df['Atributo'].astype(int)
         
         if "CANTIDAD" in df.columns:
-            df['CANTIDAD'] = pd.to_numeric(df['CANTIDAD'], errors='coerce')
+            conversiones['CANTIDAD'] = pd.to_numeric(df['CANTIDAD'], errors='coerce')
         
         if "PRECIO INDEXADO" in df.columns:
-            df['PRECIO INDEXADO'] = pd.to_numeric(df['PRECIO INDEXADO'], errors='coerce')
+            conversiones['PRECIO INDEXADO'] = pd.to_numeric(df['PRECIO INDEXADO'], errors='coerce')
+        
+        if conversiones:
+            df = df.assign(**conversiones)
         
         # Filtrar ofertas válidas
-        if "PRECIO INDEXADO" in df.columns and "CANTIDAD" in df.columns:
-            df_filtrada = df.dropna(subset=['PRECIO INDEXADO'])
-            df_filtrada = df_filtrada[df_filtrada['CANTIDAD'] > 0]
+        if _COLUMNAS_FILTRO.issubset(df.columns):
+            # Una sola máscara combinada y una sola selección de filas
+            validas = df['PRECIO INDEXADO'].notna() & (df['CANTIDAD'] > 0)
         
             # Filtrar ofertas que cumplen evaluación si existe esa columna
-            if "EVALUACIÓN" in df_filtrada.columns:
-                df_filtrada = df_filtrada[df_filtrada['EVALUACIÓN'] == 1]  # Suponiendo que 1 = cumple
+            if "EVALUACIÓN" in df.columns:
+                validas &= df['EVALUACIÓN'] == 1  # Suponiendo que 1 = cumple
             
-            logger.info(f"Se leyeron {len(df)} ofertas, de las cuales {len(df_filtrada)} son válidas para optimización")
-            print(f"Se leyeron {len(df)} ofertas, de las cuales {len(df_filtrada)} son válidas para optimización")
+            df_filtrada = df[validas]
             
+            logger.info(f"Se leyeron {len(df)} ofertas, de las cuales {len(df_filtrada)} son válidas para optimización")
+
+            # Tipos compactos: claves de agrupación como códigos enteros en lugar de objetos y
+            # la evaluación (solo quedan unos tras el filtro) como entero pequeño. Cantidades y
+            # precios se mantienen en float64 porque alimentan el modelo y los costos
+            tipos = {
+                columna: tipo
+                for columna, tipo in _TIPOS_COMPACTOS.items()
+                if columna in df_filtrada.columns
+            }
+            if tipos:
+                df_filtrada = df_filtrada.astype(tipos)
+
             return df_filtrada
         else:
             return df
     except Exception as e:
         logger.error(f"Error al leer ofertas evaluadas: {e}")
-        print(f"Error al leer ofertas evaluadas: {e}")
         return pd.DataFrame()
 
-def exportar_resultados_por_oferta(resultados_dict, archivo_salida):
+def _escribir_hoja_analisis(libro, nombre_hoja, df):
+    """
+    Escribe una hoja de resultados, sin consolidar, en el libro de análisis detallado.
+    
+    Args:
+        libro (Workbook): Libro de análisis (de solo escritura)
+        nombre_hoja (str): Clave del resultado en resultados_dict
+        df (DataFrame): Resultado a exportar (no vacío)
+    """
+    # Para hojas de demanda asignada y no asignada
+    if "DEMANDA ASIGNADA" in nombre_hoja:
+        # Convertir fechas a formato string DD/MM/YYYY
+        if "FECHA" in df.columns:
+            df_export = df.assign(
+                X=_formatear_fechas(df["FECHA"])
+            ).drop(columns=["FECHA"])
+            
+            # Determinar título apropiado basado en el tipo de hoja
+            if "_COMPRAR" in nombre_hoja:
+                titulo = "ENERGÍA A COMPRAR AL VENDEDOR"
+            elif "_NO_COMPRADA" in nombre_hoja:
+                titulo = "ENERGÍA NO COMPRADA AL VENDEDOR"
+            else:
+                # Clave sin sufijo de tipo: se exporta igual con un título genérico
+                titulo = "DEMANDA ASIGNADA AL VENDEDOR"
+
+            # Título del cuadro sobre los datos
+            df_final, fila_titulo = _cuadro_con_titulo(titulo, df_export)
+            
+            # Crear nombre de hoja en el formato solicitado: DA-OP1_Wide- EPM-IT1 o ENA-OP1_Wide- EPM-IT1
+            coincidencia = _PATRON_HOJA_ASIGNADA.match(nombre_hoja)
+            if coincidencia is not None:
+                oferta_part, it_num, tipo = coincidencia.groups()
+                
+                # Número de iteración (IT1 si la clave no lo trae) y prefijo según el tipo
+                it_part = f"IT{it_num}" if it_num else "IT1"
+                prefix = "DA" if tipo == "COMPRAR" else "ENA"
+                
+                # Limitar a 31 caracteres si es necesario
+                sheet_name = f"{prefix}-{oferta_part}-{it_part}"[:31]
+            else:
+                # Si la clave no tiene el formato esperado, usar un nombre simplificado
+                logger.warning("Error al crear nombre de hoja para %s: formato no reconocido", nombre_hoja)
+                sheet_name = nombre_hoja[:31]
+            
+            # Exportar sin el índice
+            escribir_hoja_df(libro, sheet_name, df_final, fila_titulo=fila_titulo)
+            logger.info("Hoja exportada a análisis: %s", sheet_name)
+    
+    # Para hoja de demanda faltante
+    elif nombre_hoja == "DEMANDA_FALTANTE":
+        # Convertir fechas a formato string DD/MM/YYYY
+        if "FECHA" in df.columns:
+            df_export = df.assign(
+                X=_formatear_fechas(df["FECHA"])
+            ).drop(columns=["FECHA"])
+            
+            df_final, fila_titulo = _cuadro_con_titulo("DEMANDA FALTANTE POR HORA Y DÍA", df_export)
+            escribir_hoja_df(libro, "DEMANDA FALTANTE", df_final, fila_titulo=fila_titulo)
+            logger.info("Hoja DEMANDA FALTANTE exportada a análisis")
+    
+    # Para la hoja de resumen ejecutivo
+    elif nombre_hoja == "RESUMEN EJECUTIVO":
+        df_export = df
+        
+        # Fila de títulos vacía según las columnas disponibles (FECHA primero)
+        columnas = ["FECHA", *(col for col in df_export.columns if col != "FECHA")]
+        
+        # Usar el nombre original para las hojas de resumen
+        escribir_hoja_df(
+            libro, nombre_hoja, df_export.reindex(columns=columnas),
+            fila_titulo=[""] * len(columnas)
+        )
+        logger.info("Hoja %s exportada a análisis", nombre_hoja)
+    
+    # Otras hojas (por si acaso)
+    else:
+        escribir_hoja_df(libro, nombre_hoja[:31], df)
+        logger.info("Otra hoja exportada a análisis: %s", nombre_hoja[:31])
+
+def exportar_resultados_por_oferta(resultados_dict, archivo_salida, ofertas_df=None):
     """
     Exporta los resultados de la optimización al formato específico requerido.
     Consolida todas las iteraciones en una sola hoja por oferta.
@@ -331,220 +689,237 @@ def exportar_resultados_por_oferta(resultados_dict, archivo_salida):
     Args:
         resultados_dict (dict): Diccionario con los DataFrames de resultados
         archivo_salida (str o Path): Ruta donde se guardará el archivo Excel
+        ofertas_df (DataFrame, optional): Hoja CANTIDADES Y PRECIOS sin filtrar (incluye las
+            ofertas con EVALUACIÓN = 0). Si no se entrega, se lee de archivo_salida
         
     Returns:
         bool: True si la exportación fue exitosa, False en caso contrario
     """
     archivo_salida = Path(archivo_salida)
     logger.info(f"Exportando resultados al archivo: {archivo_salida}")
-    print(f"Exportando resultados al archivo: {archivo_salida}")
     
     # También crear un archivo secundario para análisis detallado
     archivo_analisis = archivo_salida.parent / f"{archivo_salida.stem}_analisis{archivo_salida.suffix}"
-    print(f"Creando archivo de análisis detallado: {archivo_analisis}")
+    logger.info("Creando archivo de análisis detallado: %s", archivo_analisis)
     
     # Crear directorios si no existen
     archivo_salida.parent.mkdir(parents=True, exist_ok=True)
     
-    # Verificar si el archivo existe
-    archivo_existe = archivo_salida.exists()
+    # Agrupar una sola vez las hojas de demanda asignada por oferta y tipo
+    hojas_por_oferta = _agrupar_hojas_asignadas(resultados_dict)
+    
+    # Hojas del archivo principal (se preparan primero y se escriben todas en una sola
+    # sesión); se conservan fuera del try para poder reintentar la escritura
+    hojas_principal = []
+    principal_guardado = False
     
     try:
-        # Primero, leer los datos originales de las ofertas para obtener las cantidades totales
-        ofertas_originales = {}
+        # Primero, obtener los datos originales de las ofertas para las cantidades rechazadas
+        registros_originales = 0
         ofertas_rechazadas_por_precio = {}  # Para almacenar ofertas que no cumplieron evaluación
         
         try:
-            # Leer la hoja CANTIDADES Y PRECIOS para obtener información de ofertas originales
-            ofertas_df = pd.read_excel(archivo_salida, sheet_name="CANTIDADES Y PRECIOS")
-            if not ofertas_df.empty:
-                for idx, row in ofertas_df.iterrows():
-                    oferta = row.get('CÓDIGO OFERTA', '')
-                    fecha = row.get('FECHA', None)
-                    hora = row.get('Atributo', None)
-                    cantidad = row.get('CANTIDAD', 0)
-                    evaluacion = row.get('EVALUACIÓN', 0)
-                    precio = row.get('PRECIO INDEXADO', 0)
-                    
-                    if oferta and fecha and hora is not None:
-                        clave = (oferta, fecha, hora)
-                        ofertas_originales[clave] = {
-                            'cantidad': cantidad,
-                            'evaluacion': evaluacion,
-                            'precio': precio
-                        }
-                        
-                        # Si la evaluación es 0, guardar para reporte de rechazadas
-                        if evaluacion == 0:
-                            if oferta not in ofertas_rechazadas_por_precio:
-                                ofertas_rechazadas_por_precio[oferta] = []
-                            
-                            ofertas_rechazadas_por_precio[oferta].append({
-                                'FECHA': fecha,
-                                'HORA': hora,
-                                'CANTIDAD': cantidad,
-                                'PRECIO': precio
-                            })
+            # Leer la hoja CANTIDADES Y PRECIOS solo si no se entregó ya cargada
+            if ofertas_df is None:
+                ofertas_df = pd.read_excel(archivo_salida, sheet_name="CANTIDADES Y PRECIOS")
+            registros_originales, ofertas_rechazadas_por_precio = _agrupar_ofertas_rechazadas(ofertas_df)
             
-            if ofertas_originales:
-                print(f"Información de {len(ofertas_originales)} registros originales cargada correctamente")
+            if registros_originales:
+                logger.info("Información de %s registros originales cargada correctamente", registros_originales)
                 
                 # Mostrar cuántas ofertas no cumplieron evaluación
                 rechazadas_count = sum(len(items) for items in ofertas_rechazadas_por_precio.values())
                 if rechazadas_count > 0:
-                    print(f"Se encontraron {rechazadas_count} registros que no cumplieron la evaluación de precio")
+                    logger.info("Se encontraron %s registros que no cumplieron la evaluación de precio", rechazadas_count)
             else:
-                print("No se encontró información de ofertas originales")
+                logger.info("No se encontró información de ofertas originales")
         except Exception as e:
             logger.warning(f"No se pudo leer información original de ofertas: {e}")
-            print(f"No se pudo leer información original de ofertas: {e}")
         
         # 1. ARCHIVO PRINCIPAL PARA CLIENTE (CONSOLIDADO)
-        # Usar modo 'a' (append) si el archivo existe, 'w' (write) si no existe
-        modo = 'a' if archivo_existe else 'w'
-        
-        with pd.ExcelWriter(archivo_salida, engine='openpyxl', mode=modo, if_sheet_exists='replace') as writer:
-            # Identificar todas las ofertas únicas en los resultados
-            ofertas_unicas = set()
-            for key in resultados_dict.keys():
-                if "_COMPRAR" in key:
-                    # Extraer nombre de la oferta (sin "DEMANDA ASIGNADA" y sin "IT#_COMPRAR")
-                    nombre_oferta = key.split("DEMANDA ASIGNADA ")[1].split(" IT")[0]
-                    ofertas_unicas.add(nombre_oferta)
-            
-            # Agregar las ofertas rechazadas que no aparecen en los resultados
-            for oferta in ofertas_rechazadas_por_precio.keys():
-                if oferta not in ofertas_unicas:
-                    print(f"Añadiendo oferta completamente rechazada: {oferta}")
-                    ofertas_unicas.add(oferta)
+        # Si el archivo existe se reemplazan sus hojas de resultados; si no, se crea
+        # con un libro de solo escritura
+        
+        # Identificar todas las ofertas únicas en los resultados (las que tienen compras),
+        # conservando el orden en que aparecen
+        ofertas_unicas = dict.fromkeys(
+            oferta for oferta, hojas in hojas_por_oferta.items() if hojas["COMPRAR"]
+        )
+        
+        # Agregar las ofertas rechazadas que no aparecen en los resultados
+        for oferta in ofertas_rechazadas_por_precio.keys():
+            if oferta not in ofertas_unicas:
+                logger.info("Añadiendo oferta completamente rechazada: %s", oferta)
+                ofertas_unicas[oferta] = None
+        
+        # Para cada oferta, consolidar todas las iteraciones o crear hojas nuevas para rechazadas
+        for oferta in ofertas_unicas:
+            # Verificar si la oferta tiene asignaciones o solo fue rechazada por precio
+            hojas_oferta = hojas_por_oferta.get(oferta, {"COMPRAR": [], "NO_COMPRADA": []})
             
-            # Para cada oferta, consolidar todas las iteraciones o crear hojas nuevas para rechazadas
-            for oferta in ofertas_unicas:
-                # Verificar si la oferta tiene asignaciones o solo fue rechazada por precio
-                tiene_asignaciones = False
-                for key in resultados_dict.keys():
-                    if f"DEMANDA ASIGNADA {oferta}" in key and "_COMPRAR" in key:
-                        tiene_asignaciones = True
-                        break
+            if hojas_oferta["COMPRAR"]:
+                # CASO 1: La oferta tiene asignaciones en la optimización
+                # Consolidar datos de compras
+                df_comprar_consolidado = pd.DataFrame()
+                
+                # Para la energía no comprada, usar solo la última iteración
+                df_no_comprado_consolidado = None
+                ultima_iteracion = 0
                 
-                if tiene_asignaciones:
-                    # CASO 1: La oferta tiene asignaciones en la optimización
-                    # Consolidar datos de compras
-                    df_comprar_consolidado = pd.DataFrame()
+                # Recorrer todas las iteraciones de compra de esta oferta
+                iteraciones_adicionales = []
+                for it_num, key in hojas_oferta["COMPRAR"]:
+                    df_iter = resultados_dict[key]
                     
-                    # Para la energía no comprada, usar solo la última iteración
-                    df_no_comprado_consolidado = None
-                    ultima_iteracion = 0
+                    # Número de iteración
+                    if it_num is not None:
+                        ultima_iteracion = max(ultima_iteracion, it_num)
+                    else:
+                        logger.warning("No se pudo extraer número de iteración de %s", key)
                     
-                    # Buscar todas las iteraciones para esta oferta
-                    for key in resultados_dict.keys():
-                        if f"DEMANDA ASIGNADA {oferta}" in key and "_COMPRAR" in key:
-                            df_iter = resultados_dict[key].copy()
-                            
-                            # Extraer número de iteración
-                            try:
-                                it_num = int(key.split("IT")[1].split("_")[0])
-                                ultima_iteracion = max(ultima_iteracion, it_num)
-                            except:
-                                logger.warning(f"No se pudo extraer número de iteración de {key}")
-                            
-                            # Sumar a la consolidación si ya existen datos, o inicializar
-                            if df_comprar_consolidado.empty:
-                                df_comprar_consolidado = df_iter.copy()
-                            else:
-                                # Solo sumar los valores numéricos (horas), mantener FECHA
-                                for hora in range(1, 25):
-                                    if hora in df_iter.columns and hora in df_comprar_consolidado.columns:
-                                        # Suma hora por hora
-                                        for idx, row in df_iter.iterrows():
-                                            fecha = row['FECHA']
-                                            # Buscar la fila correspondiente en el df consolidado
-                                            fecha_rows = df_comprar_consolidado[df_comprar_consolidado['FECHA'] == fecha]
-                                            if not fecha_rows.empty:
-                                                df_comprar_consolidado.loc[df_comprar_consolidado['FECHA'] == fecha, hora] += row[hora]
+                    # La primera iteración con datos define las filas de la consolidación;
+                    # las demás se suman sobre ella
+                    if df_comprar_consolidado.empty:
+                        df_comprar_consolidado = df_iter
+                    else:
+                        iteraciones_adicionales.append(df_iter)
+                
+                if iteraciones_adicionales:
+                    # Solo sumar los valores numéricos (horas), mantener FECHA
+                    horas = [hora for hora in range(1, 25) if hora in df_comprar_consolidado.columns]
                     
-                    # Para la energía no comprada, usar solo la última iteración
-                    key_ultima_it_no_comprada = f"DEMANDA ASIGNADA {oferta} IT{ultima_iteracion}_NO_COMPRADA"
-                    if key_ultima_it_no_comprada in resultados_dict:
-                        df_no_comprado_consolidado = resultados_dict[key_ultima_it_no_comprada].copy()
+                    # Totales por fecha de todas las iteraciones adicionales en una sola agrupación,
+                    # alineados con las filas consolidadas (las fechas que no están en la
+                    # consolidación no suman)
+                    sumas = pd.concat(
+                        [df.reindex(columns=["FECHA", *horas]) for df in iteraciones_adicionales],
+                        ignore_index=True
+                    ).groupby("FECHA", sort=False)[horas].sum()
+                    sumas = sumas.reindex(df_comprar_consolidado["FECHA"]).fillna(0)
+                    
+                    # Nuevo DataFrame con las horas sumadas; las demás columnas se toman sin
+                    # copiar y los resultados originales no se modifican
+                    totales = df_comprar_consolidado[horas].to_numpy() + sumas.to_numpy()
+                    posicion_hora = {hora: j for j, hora in enumerate(horas)}
+                    df_comprar_consolidado = pd.DataFrame(
+                        {
+                            col: totales[:, posicion_hora[col]] if col in posicion_hora else df_comprar_consolidado[col]
+                            for col in df_comprar_consolidado.columns
+                        },
+                        index=df_comprar_consolidado.index
+                    )
+                
+                # Para la energía no comprada, usar solo la última iteración
+                key_ultima_it_no_comprada = f"DEMANDA ASIGNADA {oferta} IT{ultima_iteracion}_NO_COMPRADA"
+                if key_ultima_it_no_comprada in resultados_dict:
+                    df_no_comprado_consolidado = resultados_dict[key_ultima_it_no_comprada]
+                else:
+                    # Si no se encuentra la última iteración, buscar la mayor disponible
+                    it_guardada = None
+                    for it_actual, key in hojas_oferta["NO_COMPRADA"]:
+                        if df_no_comprado_consolidado is None:
+                            df_no_comprado_consolidado = resultados_dict[key]
+                            it_guardada = it_actual
+                        elif it_actual is None or it_guardada is None:
+                            logger.warning("No se pudo comparar iteraciones de %s para la oferta %s", key, oferta)
+                        elif it_actual > it_guardada:
+                            df_no_comprado_consolidado = resultados_dict[key]
+                            it_guardada = it_actual
+                
+                # Si no se encontró ninguna, crear un DataFrame vacío
+                if df_no_comprado_consolidado is None:
+                    logger.warning("No se encontró información de energía no comprada para oferta %s", oferta)
+                    # Crear DataFrame vacío con la misma estructura que el consolidado de compras
+                    if not df_comprar_consolidado.empty:
+                        df_no_comprado_consolidado = pd.DataFrame(
+                            {
+                                col: df_comprar_consolidado[col] if col in ('FECHA', 'X') else 0
+                                for col in df_comprar_consolidado.columns
+                            },
+                            index=df_comprar_consolidado.index
+                        )
                     else:
-                        # Si no se encuentra la última iteración, buscar la mayor disponible
-                        for key in resultados_dict.keys():
-                            if f"DEMANDA ASIGNADA {oferta}" in key and "_NO_COMPRADA" in key:
-                                df_iter = resultados_dict[key].copy()
-                                if df_no_comprado_consolidado is None:
-                                    df_no_comprado_consolidado = df_iter.copy()
-                                    # Guardar el nombre para comparaciones posteriores
-                                    df_no_comprado_consolidado.name = key
-                                else:
-                                    # Comparar iteraciones
-                                    try:
-                                        it_actual = int(key.split("IT")[1].split("_")[0])
-                                        it_guardada = int(df_no_comprado_consolidado.name.split("IT")[1].split("_")[0])
-                                        if it_actual > it_guardada:
-                                            df_no_comprado_consolidado = df_iter.copy()
-                                            df_no_comprado_consolidado.name = key
-                                    except:
-                                        logger.warning(f"No se pudo comparar iteraciones entre {key} y {df_no_comprado_consolidado.name}")
+                        # Si no hay datos de compras, no hay datos para no compradas
+                        continue
+                
+                # Ahora, combinar la energía no asignada de la optimización con la rechazada por precio
+                # (la combinación devuelve un DataFrame nuevo; los resultados no se modifican)
+                df_no_comprado_total = df_no_comprado_consolidado
+                if oferta in ofertas_rechazadas_por_precio:
+                    df_no_comprado_total = _combinar_rechazadas(
+                        df_no_comprado_consolidado, ofertas_rechazadas_por_precio[oferta]
+                    )
+                
+                # Si tenemos datos consolidados, exportar
+                if not df_comprar_consolidado.empty:
+                    # Mantener el orden cronológico original.
+                    # Convertir fechas a formato string DD/MM/YYYY y eliminar FECHA (mantener sólo X)
+                    df_comprar_ordenado = df_comprar_consolidado.assign(
+                        X=_formatear_fechas(df_comprar_consolidado["FECHA"])
+                    ).drop(columns=["FECHA"])
                     
-                    # Si no se encontró ninguna, crear un DataFrame vacío
-                    if df_no_comprado_consolidado is None:
-                        logger.warning(f"No se encontró información de energía no comprada para oferta {oferta}")
-                        # Crear DataFrame vacío con la misma estructura que el consolidado de compras
-                        if not df_comprar_consolidado.empty:
-                            df_no_comprado_consolidado = df_comprar_consolidado.copy()
-                            for col in df_no_comprado_consolidado.columns:
-                                if col not in ['FECHA', 'X']:
-                                    df_no_comprado_consolidado[col] = 0
-                        else:
-                            # Si no hay datos de compras, no hay datos para no compradas
-                            continue
+                    # Añadir un título para el cuadro sobre los datos
+                    cuadro_comprar = _cuadro_con_titulo("ENERGÍA A COMPRAR AL VENDEDOR", df_comprar_ordenado)
                     
-                    # Ahora, combinar la energía no asignada de la optimización con la rechazada por precio
-                    # Crear una copia del DataFrame no comprado para añadir lo rechazado por precio
-                    df_no_comprado_total = df_no_comprado_consolidado.copy()
+                    # Asegurar que el nombre de la hoja no exceda los 31 caracteres
+                    sheet_name = f"DA-{oferta}"
+                    if len(sheet_name) > 31:
+                        sheet_name = sheet_name[:31]
                     
-                    # Añadir las ofertas rechazadas por precio
-                    if oferta in ofertas_rechazadas_por_precio:
-                        rechazadas = ofertas_rechazadas_por_precio[oferta]
-                        for item in rechazadas:
-                            fecha = item['FECHA']
-                            hora = item['HORA']
-                            cantidad = item['CANTIDAD']
-                            
-                            # Buscar la fila para esta fecha
-                            fecha_rows = df_no_comprado_total[df_no_comprado_total['FECHA'] == fecha]
-                            if len(fecha_rows) > 0:
-                                # Si existe la fila, actualizar el valor para esta hora
-                                df_no_comprado_total.loc[df_no_comprado_total['FECHA'] == fecha, hora] = cantidad
-                            else:
-                                # Si no existe la fila, crear una nueva
-                                nueva_fila = {'FECHA': fecha}
-                                for h in range(1, 25):
-                                    nueva_fila[h] = cantidad if h == hora else 0
-                                
-                                # Añadir la fila al DataFrame
-                                df_no_comprado_total = pd.concat([df_no_comprado_total, pd.DataFrame([nueva_fila])], ignore_index=True)
+                    # Exportar sin el índice
+                    hojas_principal.append((sheet_name, *cuadro_comprar))
+                    logger.info("Hoja exportada: %s", sheet_name)
+                
+                # Exportar la energía no comprada (total)
+                if df_no_comprado_total is not None and not df_no_comprado_total.empty:
+                    # Mantener el orden cronológico original
+                    df_no_comprado_ordenado = df_no_comprado_total
                     
-                    # Si tenemos datos consolidados, exportar
-                    if not df_comprar_consolidado.empty:
-                        # Mantener el orden cronológico original
-                        df_comprar_ordenado = df_comprar_consolidado.copy()
+                    # Convertir fechas a formato string DD/MM/YYYY y eliminar FECHA (mantener sólo X)
+                    if "FECHA" in df_no_comprado_ordenado.columns:
+                        df_no_comprado_ordenado = df_no_comprado_ordenado.assign(
+                            X=_formatear_fechas(df_no_comprado_ordenado["FECHA"])
+                        ).drop(columns=["FECHA"])
+                    
+                    # Añadir un título para el cuadro sobre los datos
+                    cuadro_no_comprada = _cuadro_con_titulo("ENERGÍA NO COMPRADA AL VENDEDOR", df_no_comprado_ordenado)
+                    
+                    # Nombre de la hoja
+                    sheet_name_ena = f"ENA-{oferta}"
+                    if len(sheet_name_ena) > 31:
+                        sheet_name_ena = sheet_name_ena[:31]
+                    
+                    # Exportar sin el índice
+                    hojas_principal.append((sheet_name_ena, *cuadro_no_comprada))
+                    logger.info("Hoja exportada: %s", sheet_name_ena)
+            else:
+                # CASO 2: La oferta fue completamente rechazada por precio
+                # Verificar si tiene datos de rechazo
+                if oferta in ofertas_rechazadas_por_precio:
+                    rechazadas = ofertas_rechazadas_por_precio[oferta]
+                    
+                    # 1. Crear DataFrame para DA (todos ceros)
+                    fechas_unicas = sorted(list(set(item['FECHA'] for item in rechazadas)))
+                    
+                    # Crear DataFrame vacío para DA (todo ceros)
+                    da_rows = []
+                    for fecha in fechas_unicas:
+                        row = {"FECHA": fecha}
+                        for hora in range(1, 25):
+                            row[hora] = 0  # Todos los valores son cero
+                        da_rows.append(row)
+                    
+                    if da_rows:
+                        da_df = pd.DataFrame(da_rows)
                         
                         # Convertir fechas a formato string DD/MM/YYYY
-                        df_comprar_ordenado["X"] = df_comprar_ordenado["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
+                        da_df["X"] = _formatear_fechas(da_df["FECHA"])
                         
                         # Eliminar columna FECHA (mantener sólo X)
-                        df_comprar_ordenado = df_comprar_ordenado.drop(columns=["FECHA"])
-                        
-                        # Añadir un título para el cuadro
-                        titulo_comprar = pd.DataFrame({
-                            "X": ["ENERGÍA A COMPRAR AL VENDEDOR"],
-                            **{i: [None] for i in range(1, 25)}  # Columnas del 1 al 24
-                        })
+                        da_df = da_df.drop(columns=["FECHA"])
                         
-                        # Concatenar título y datos
-                        df_final_comprar = pd.concat([titulo_comprar, df_comprar_ordenado], ignore_index=True)
+                        # Añadir un título para el cuadro sobre los datos
+                        cuadro_da = _cuadro_con_titulo("ENERGÍA A COMPRAR AL VENDEDOR", da_df)
                         
                         # Asegurar que el nombre de la hoja no exceda los 31 caracteres
                         sheet_name = f"DA-{oferta}"
@@ -552,29 +927,35 @@ def exportar_resultados_por_oferta(resultados_dict, archivo_salida):
                             sheet_name = sheet_name[:31]
                         
                         # Exportar sin el índice
-                        df_final_comprar.to_excel(writer, sheet_name=sheet_name, index=False)
-                        logger.info(f"Hoja exportada: {sheet_name}")
+                        hojas_principal.append((sheet_name, *cuadro_da))
+                        logger.info("Hoja DA exportada para oferta completamente rechazada: %s", oferta)
                     
-                    # Exportar la energía no comprada (total)
-                    if df_no_comprado_total is not None and not df_no_comprado_total.empty:
-                        # Mantener el orden cronológico original
-                        df_no_comprado_ordenado = df_no_comprado_total.copy()
+                    # 2. Crear DataFrame para ENA (valores originales)
+                    ena_rows = []
+                    for fecha in fechas_unicas:
+                        row = {"FECHA": fecha}
+                        # Inicializar todas las horas con cero
+                        for hora in range(1, 25):
+                            row[hora] = 0
+                        
+                        # Luego, actualizar con los valores reales de las ofertas rechazadas
+                        for item in rechazadas:
+                            if item['FECHA'] == fecha:
+                                row[item['HORA']] = item['CANTIDAD']
+                        
+                        ena_rows.append(row)
+                    
+                    if ena_rows:
+                        ena_df = pd.DataFrame(ena_rows)
                         
                         # Convertir fechas a formato string DD/MM/YYYY
-                        if "FECHA" in df_no_comprado_ordenado.columns:
-                            df_no_comprado_ordenado["X"] = df_no_comprado_ordenado["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
-                            
-                            # Eliminar columna FECHA (mantener sólo X)
-                            df_no_comprado_ordenado = df_no_comprado_ordenado.drop(columns=["FECHA"])
+                        ena_df["X"] = _formatear_fechas(ena_df["FECHA"])
                         
-                        # Añadir un título para el cuadro
-                        titulo_no_comprada = pd.DataFrame({
-                            "X": ["ENERGÍA NO COMPRADA AL VENDEDOR"],
-                            **{i: [None] for i in range(1, 25)}  # Columnas del 1 al 24
-                        })
+                        # Eliminar columna FECHA (mantener sólo X)
+                        ena_df = ena_df.drop(columns=["FECHA"])
                         
-                        # Concatenar título y datos
-                        df_final_no_comprada = pd.concat([titulo_no_comprada, df_no_comprado_ordenado], ignore_index=True)
+                        # Añadir un título para el cuadro sobre los datos
+                        cuadro_ena = _cuadro_con_titulo("ENERGÍA NO COMPRADA AL VENDEDOR", ena_df)
                         
                         # Nombre de la hoja
                         sheet_name_ena = f"ENA-{oferta}"
@@ -582,303 +963,124 @@ def exportar_resultados_por_oferta(resultados_dict, archivo_salida):
                             sheet_name_ena = sheet_name_ena[:31]
                         
                         # Exportar sin el índice
-                        df_final_no_comprada.to_excel(writer, sheet_name=sheet_name_ena, index=False)
-                        logger.info(f"Hoja exportada: {sheet_name_ena}")
-                else:
-                    # CASO 2: La oferta fue completamente rechazada por precio
-                    # Verificar si tiene datos de rechazo
-                    if oferta in ofertas_rechazadas_por_precio:
-                        rechazadas = ofertas_rechazadas_por_precio[oferta]
-                        
-                        # 1. Crear DataFrame para DA (todos ceros)
-                        fechas_unicas = sorted(list(set(item['FECHA'] for item in rechazadas)))
-                        
-                        # Crear DataFrame vacío para DA (todo ceros)
-                        da_rows = []
-                        for fecha in fechas_unicas:
-                            row = {"FECHA": fecha}
-                            for hora in range(1, 25):
-                                row[hora] = 0  # Todos los valores son cero
-                            da_rows.append(row)
-                        
-                        if da_rows:
-                            da_df = pd.DataFrame(da_rows)
-                            
-                            # Convertir fechas a formato string DD/MM/YYYY
-                            da_df["X"] = da_df["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
-                            
-                            # Eliminar columna FECHA (mantener sólo X)
-                            da_df = da_df.drop(columns=["FECHA"])
-                            
-                            # Añadir un título para el cuadro
-                            titulo_da = pd.DataFrame({
-                                "X": ["ENERGÍA A COMPRAR AL VENDEDOR"],
-                                **{i: [None] for i in range(1, 25)}  # Columnas del 1 al 24
-                            })
-                            
-                            # Concatenar título y datos
-                            df_final_da = pd.concat([titulo_da, da_df], ignore_index=True)
-                            
-                            # Asegurar que el nombre de la hoja no exceda los 31 caracteres
-                            sheet_name = f"DA-{oferta}"
-                            if len(sheet_name) > 31:
-                                sheet_name = sheet_name[:31]
-                            
-                            # Exportar sin el índice
-                            df_final_da.to_excel(writer, sheet_name=sheet_name, index=False)
-                            logger.info(f"Hoja DA exportada para oferta completamente rechazada: {oferta}")
-                            print(f"Hoja DA exportada para oferta completamente rechazada: {oferta}")
-                        
-                        # 2. Crear DataFrame para ENA (valores originales)
-                        ena_rows = []
-                        for fecha in fechas_unicas:
-                            row = {"FECHA": fecha}
-                            # Inicializar todas las horas con cero
-                            for hora in range(1, 25):
-                                row[hora] = 0
-                            
-                            # Luego, actualizar con los valores reales de las ofertas rechazadas
-                            for item in rechazadas:
-                                if item['FECHA'] == fecha:
-                                    row[item['HORA']] = item['CANTIDAD']
-                            
-                            ena_rows.append(row)
-                        
-                        if ena_rows:
-                            ena_df = pd.DataFrame(ena_rows)
-                            
-                            # Convertir fechas a formato string DD/MM/YYYY
-                            ena_df["X"] = ena_df["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
-                            
-                            # Eliminar columna FECHA (mantener sólo X)
-                            ena_df = ena_df.drop(columns=["FECHA"])
-                            
-                            # Añadir un título para el cuadro
-                            titulo_ena = pd.DataFrame({
-                                "X": ["ENERGÍA NO COMPRADA AL VENDEDOR"],
-                                **{i: [None] for i in range(1, 25)}  # Columnas del 1 al 24
-                            })
-                            
-                            # Concatenar título y datos
-                            df_final_ena = pd.concat([titulo_ena, ena_df], ignore_index=True)
-                            
-                            # Nombre de la hoja
-                            sheet_name_ena = f"ENA-{oferta}"
-                            if len(sheet_name_ena) > 31:
-                                sheet_name_ena = sheet_name_ena[:31]
-                            
-                            # Exportar sin el índice
-                            df_final_ena.to_excel(writer, sheet_name=sheet_name_ena, index=False)
-                            logger.info(f"Hoja ENA exportada para oferta completamente rechazada: {oferta}")
-                            print(f"Hoja ENA exportada para oferta completamente rechazada: {oferta}")
+                        hojas_principal.append((sheet_name_ena, *cuadro_ena))
+                        logger.info("Hoja ENA exportada para oferta completamente rechazada: %s", oferta)
+        
+        # 2. Exportar hoja de DEMANDA FALTANTE
+        if "DEMANDA_FALTANTE" in resultados_dict:
+            df_faltante = resultados_dict["DEMANDA_FALTANTE"]
             
-            # 2. Exportar hoja de DEMANDA FALTANTE
-            if "DEMANDA_FALTANTE" in resultados_dict:
-                df_export = resultados_dict["DEMANDA_FALTANTE"].copy()
-                
-                # Mantener el orden cronológico original
-                # Convertir fechas a formato string DD/MM/YYYY sin ordenar
-                df_export["X"] = df_export["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
-                df_export = df_export.drop(columns=["FECHA"])
-                
-                # Añadir un título a la hoja DEMANDA FALTANTE
-                titulo_faltante = pd.DataFrame({
-                    "X": ["DEMANDA FALTANTE POR HORA Y DÍA"],
-                    **{i: [None] for i in range(1, 25)}  # Columnas del 1 al 24
-                })
-                
-                # Concatenar título y datos
-                df_final = pd.concat([titulo_faltante, df_export], ignore_index=True)
-                
-                df_final.to_excel(writer, sheet_name="DEMANDA FALTANTE", index=False)
-                logger.info(f"Hoja exportada: DEMANDA FALTANTE")
+            # Mantener el orden cronológico original
+            # Convertir fechas a formato string DD/MM/YYYY sin ordenar
+            df_export = df_faltante.assign(
+                X=_formatear_fechas(df_faltante["FECHA"])
+            ).drop(columns=["FECHA"])
             
-            # Exportar hoja de RESUMEN EJECUTIVO (reemplaza a las hojas RESUMEN y RESUMEN SIN INDEXAR)
-            if "RESUMEN EJECUTIVO" in resultados_dict:
-                df_export = resultados_dict["RESUMEN EJECUTIVO"].copy()
-                
-                # El formato de fecha ya está establecido como MM/YYYY
-                # No reordenar, preservar el orden original
-                
-                # Crear títulos dinámicamente según las columnas disponibles
-                titulos = {}
-                titulos["FECHA"] = ""
-                for col in df_export.columns:
-                    if col != "FECHA":
-                        # Las columnas ya incluyen las unidades en sus nombres
-                        titulos[col] = ""
-                
-                # Añadir la fila de títulos
-                titulo_df = pd.DataFrame([titulos])
-                
-                # Concatenar título y datos
-                df_final = pd.concat([titulo_df, df_export], ignore_index=True)
-                
-                df_final.to_excel(writer, sheet_name="RESUMEN EJECUTIVO", index=False)
-                logger.info(f"Hoja exportada: RESUMEN EJECUTIVO")
+            # Añadir un título para el cuadro sobre los datos
+            cuadro_faltante = _cuadro_con_titulo("DEMANDA FALTANTE POR HORA Y DÍA", df_export)
+            
+            hojas_principal.append(("DEMANDA FALTANTE", *cuadro_faltante))
+            logger.info(f"Hoja exportada: DEMANDA FALTANTE")
+        
+        # Exportar hoja de RESUMEN EJECUTIVO (reemplaza a las hojas RESUMEN y RESUMEN SIN INDEXAR)
+        if "RESUMEN EJECUTIVO" in resultados_dict:
+            df_export = resultados_dict["RESUMEN EJECUTIVO"]
             
-            # NUEVO: Exportar un resumen de ofertas rechazadas por precio
-            if ofertas_rechazadas_por_precio:
-                # Datos para el resumen
-                resumen_datos = []
+            # El formato de fecha ya está establecido como MM/YYYY
+            # No reordenar, preservar el orden original
+            
+            # Fila de títulos vacía según las columnas disponibles (FECHA primero); las
+            # columnas ya incluyen las unidades en sus nombres
+            columnas = ["FECHA", *(col for col in df_export.columns if col != "FECHA")]
+            
+            hojas_principal.append(("RESUMEN EJECUTIVO", df_export.reindex(columns=columnas), [""] * len(columnas)))
+            logger.info(f"Hoja exportada: RESUMEN EJECUTIVO")
+        
+        # NUEVO: Exportar un resumen de ofertas rechazadas por precio
+        if ofertas_rechazadas_por_precio:
+            # Datos para el resumen: un arreglo por columna, una posición por oferta
+            n_ofertas = len(ofertas_rechazadas_por_precio)
+            ofertas_resumen = np.empty(n_ofertas, dtype=object)
+            registros_rechazados = np.empty(n_ofertas, dtype=np.int64)
+            totales_rechazados = np.empty(n_ofertas, dtype=np.float64)
+            precios_promedio = np.empty(n_ofertas, dtype=np.float64)
+            
+            # Para cada oferta con rechazos por precio
+            for i, (oferta, rechazadas) in enumerate(ofertas_rechazadas_por_precio.items()):
+                # Calcular estadísticas sobre arreglos de numpy
+                cantidades = np.fromiter((item['CANTIDAD'] for item in rechazadas), dtype=np.float64, count=len(rechazadas))
+                precios = np.fromiter((item['PRECIO'] for item in rechazadas), dtype=np.float64, count=len(rechazadas))
+                total_rechazado = cantidades.sum()
                 
-                # Para cada oferta con rechazos por precio
-                for oferta, rechazadas in ofertas_rechazadas_por_precio.items():
-                    # Calcular estadísticas
-                    total_rechazado = sum(item['CANTIDAD'] for item in rechazadas)
-                    precio_promedio = sum(item['PRECIO'] * item['CANTIDAD'] for item in rechazadas) / total_rechazado if total_rechazado > 0 else 0
-                    
-                    resumen_datos.append({
-                        'OFERTA': oferta,
-                        'REGISTROS RECHAZADOS': len(rechazadas),
-                        'CANTIDAD TOTAL RECHAZADA (KWh)': total_rechazado,
-                        'PRECIO PROMEDIO ($/KWh)': precio_promedio
-                    })
+                ofertas_resumen[i] = oferta
+                registros_rechazados[i] = len(rechazadas)
+                totales_rechazados[i] = total_rechazado
+                precios_promedio[i] = float(precios @ cantidades) / total_rechazado if total_rechazado > 0 else 0
+            
+            # Crear DataFrame con el resumen
+            if n_ofertas:
+                # Ordenar por cantidad total rechazada (descendente, empates en el orden original)
+                orden = np.argsort(-totales_rechazados, kind="stable")
+                df_resumen_rechazos = pd.DataFrame({
+                    'OFERTA': ofertas_resumen[orden],
+                    'REGISTROS RECHAZADOS': registros_rechazados[orden],
+                    'CANTIDAD TOTAL RECHAZADA (KWh)': totales_rechazados[orden],
+                    'PRECIO PROMEDIO ($/KWh)': precios_promedio[orden]
+                })
                 
-                # Crear DataFrame con el resumen
-                if resumen_datos:
-                    df_resumen_rechazos = pd.DataFrame(resumen_datos)
-                    
-                    # Ordenar por cantidad total rechazada (descendente)
-                    df_resumen_rechazos = df_resumen_rechazos.sort_values(by='CANTIDAD TOTAL RECHAZADA (KWh)', ascending=False)
-                    
-                    # Exportar resumen
-                    df_resumen_rechazos.to_excel(writer, sheet_name="RESUMEN RECHAZOS PRECIO", index=False)
-                    logger.info("Hoja de resumen de rechazos por precio exportada")
+                # Exportar resumen
+                hojas_principal.append(("RESUMEN RECHAZOS PRECIO", df_resumen_rechazos, None))
+                logger.info("Hoja de resumen de rechazos por precio exportada")
+        
+        # Abrir y guardar el archivo una única vez para todas las hojas
+        _escribir_hojas_excel(archivo_salida, hojas_principal)
+        principal_guardado = True
         
-        print(f"Resultados consolidados exportados exitosamente a: {archivo_salida}")
+        logger.info("Resultados consolidados exportados exitosamente a: %s", archivo_salida)
         
         # 2. ARCHIVO SECUNDARIO PARA ANÁLISIS (INCLUYE TODAS LAS ITERACIONES SEPARADAS)
-        # Este archivo sigue igual porque debe contener todas las iteraciones por separado
-        with pd.ExcelWriter(archivo_analisis, engine='openpyxl') as writer:
-            # Para cada hoja en el diccionario de resultados, exportar la hoja tal cual (sin consolidar)
-            for nombre_hoja, df in resultados_dict.items():
-                if isinstance(df, pd.DataFrame) and not df.empty:
-                    # Para hojas de demanda asignada y no asignada
-                    if "DEMANDA ASIGNADA" in nombre_hoja:
-                        df_export = df.copy()
-                        
-                        # Convertir fechas a formato string DD/MM/YYYY
-                        if "FECHA" in df_export.columns:
-                            df_export["X"] = df_export["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
-                            df_export = df_export.drop(columns=["FECHA"])
-                            
-                            # Determinar título apropiado basado en el tipo de hoja
-                            if "_COMPRAR" in nombre_hoja:
-                                titulo = pd.DataFrame({
-                                    "X": ["ENERGÍA A COMPRAR AL VENDEDOR"],
-                                    **{i: [None] for i in range(1, 25)}
-                                })
-                            elif "_NO_COMPRADA" in nombre_hoja:
-                                titulo = pd.DataFrame({
-                                    "X": ["ENERGÍA NO COMPRADA AL VENDEDOR"],
-                                    **{i: [None] for i in range(1, 25)}
-                                })
-                            
-                            # Concatenar título y datos
-                            df_final = pd.concat([titulo, df_export], ignore_index=True)
-                            
-                            # Crear nombre de hoja en el formato solicitado: DA-OP1_Wide- EPM-IT1 o ENA-OP1_Wide- EPM-IT1
-                            try:
-                                # Extraer la oferta del nombre de la hoja
-                                oferta_part = nombre_hoja.split("DEMANDA ASIGNADA ")[1].split(" IT")[0]
-                                
-                                # Extraer el número de iteración
-                                it_part = "IT1"  # Valor predeterminado
-                                if "IT" in nombre_hoja:
-                                    it_match = nombre_hoja.split(" IT")[1].split("_")[0]
-                                    if it_match:
-                                        it_part = f"IT{it_match}"
-                                
-                                # Determinar el prefijo según el tipo
-                                if "_COMPRAR" in nombre_hoja:
-                                    prefix = "DA"
-                                else:
-                                    prefix = "ENA"
-                                
-                                # Construir el nombre de la hoja con el formato deseado
-                                sheet_name = f"{prefix}-{oferta_part}-{it_part}"
-                                
-                                # Limitar a 31 caracteres si es necesario
-                                if len(sheet_name) > 31:
-                                    sheet_name = sheet_name[:31]
-                                
-                            except Exception as e:
-                                # Si hay algún error en la extracción, usar un nombre simplificado
-                                logger.warning(f"Error al crear nombre de hoja para {nombre_hoja}: {e}")
-                                sheet_name = nombre_hoja[:31]
-                            
-                            # Exportar sin el índice
-                            df_final.to_excel(writer, sheet_name=sheet_name, index=False)
-                            logger.info(f"Hoja exportada a análisis: {sheet_name}")
-                    
-                    # Para hoja de demanda faltante
-                    elif nombre_hoja == "DEMANDA_FALTANTE":
-                        df_export = df.copy()
-                        
-                        # Convertir fechas a formato string DD/MM/YYYY
-                        if "FECHA" in df_export.columns:
-                            df_export["X"] = df_export["FECHA"].apply(lambda x: x.strftime('%d/%m/%Y'))
-                            df_export = df_export.drop(columns=["FECHA"])
-                            
-                            titulo = pd.DataFrame({
-                                "X": ["DEMANDA FALTANTE POR HORA Y DÍA"],
-                                **{i: [None] for i in range(1, 25)}
-                            })
-                            
-                            df_final = pd.concat([titulo, df_export], ignore_index=True)
-                            df_final.to_excel(writer, sheet_name="DEMANDA FALTANTE", index=False)
-                            logger.info("Hoja DEMANDA FALTANTE exportada a análisis")
-                    
-                    # Para la hoja de resumen ejecutivo
-                    elif nombre_hoja == "RESUMEN EJECUTIVO":
-                        df_export = df.copy()
-                        
-                        # Crear títulos dinámicamente según las columnas disponibles
-                        titulos = {}
-                        titulos["FECHA"] = ""
-                        for col in df_export.columns:
-                            if col != "FECHA":
-                                titulos[col] = ""
-                        
-                        # Añadir la fila de títulos
-                        titulo_df = pd.DataFrame([titulos])
-                        df_final = pd.concat([titulo_df, df_export], ignore_index=True)
-                        
-                        # Usar el nombre original para las hojas de resumen
-                        df_final.to_excel(writer, sheet_name=nombre_hoja, index=False)
-                        logger.info(f"Hoja {nombre_hoja} exportada a análisis")
-                    
-                    # Otras hojas (por si acaso)
-                    else:
-                        df.to_excel(writer, sheet_name=nombre_hoja[:31], index=False)
-                        logger.info(f"Otra hoja exportada a análisis: {nombre_hoja[:31]}")
-            
-            logger.info(f"Análisis detallado exportado a: {archivo_analisis}")
-            print(f"Archivo de análisis detallado creado: {archivo_analisis}")
+        # Este archivo sigue igual porque debe contener todas las iteraciones por separado.
+        # Siempre se crea desde cero, así que se usa un libro de solo escritura que envía
+        # las filas a disco a medida que se agregan
+        libro_analisis = Workbook(write_only=True)
+        # Solo se exportan los resultados con datos; se filtran una sola vez antes del recorrido
+        hojas_analisis = [
+            (nombre_hoja, df) for nombre_hoja, df in resultados_dict.items()
+            if isinstance(df, pd.DataFrame) and not df.empty
+        ]
         
+        # Para cada hoja en el diccionario de resultados, exportar la hoja tal cual (sin consolidar)
+        for nombre_hoja, df in hojas_analisis:
+            # Un error en una hoja se registra y no impide exportar las demás
+            try:
+                _escribir_hoja_analisis(libro_analisis, nombre_hoja, df)
+            except Exception as e:
+                logger.exception("Error al exportar a análisis la hoja %s: %s", nombre_hoja, e)
+        
+        libro_analisis.save(archivo_analisis)
+        logger.info(f"Análisis detallado exportado a: {archivo_analisis}")
+    
         return True
     
     except Exception as e:
         logger.exception(f"Error al exportar resultados: {e}")
-        print(f"ERROR: No se pudieron exportar los resultados: {e}")
+        
+        # Solo se reintenta si las hojas del archivo principal se alcanzaron a preparar
+        # pero no se pudieron guardar (p. ej. el archivo está abierto en Excel)
+        if principal_guardado or not hojas_principal:
+            return False
         
         try:
-            # Intentar con un archivo nuevo en caso de error
-            from datetime import datetime
+            # Intentar con un archivo nuevo en caso de error, reutilizando las hojas ya preparadas
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             nueva_ruta = archivo_salida.parent / f"{archivo_salida.stem}_nuevo_{timestamp}{archivo_salida.suffix}"
             
-            print(f"Intentando crear un archivo nuevo en: {nueva_ruta}")
+            logger.info("Intentando crear un archivo nuevo en: %s", nueva_ruta)
+            _escribir_hojas_excel(nueva_ruta, hojas_principal)
             
-            # En un entorno de producción, aquí se implementaría la misma lógica de exportación
-            # Por simplicidad, solo registramos el error
-            
-            logger.exception(f"Error al crear archivo alternativo: {e}")
-            print(f"ERROR: No se pudo crear archivo alternativo: {e}")
-            return False
+            logger.warning(f"Resultados consolidados exportados al archivo alternativo: {nueva_ruta}")
+            return True
             
         except Exception as alt_e:
             logger.exception(f"Error al crear archivo alternativo: {alt_e}")
-            print(f"ERROR: No se pudo crear archivo alternativo: {alt_e}")
             return False
\ No newline at end of file
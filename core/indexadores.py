@@ -15,54 +15,96 @@ from config import DATOS_INICIALES
 from .utils import (
     verificar_archivo_existe, 
     verificar_hoja_existe, 
-    eliminar_hoja_si_existe,
     leer_excel_seguro,
     guardar_excel_seguro,
-    solicitar_input_seguro,
-    fecha_a_texto
+    solicitar_input_seguro
 )
 
 logger = logging.getLogger(__name__)
 
-def calcular_numerador(fecha, indexador, numerador, indexadores_df, proyeccion_df):
+_COLUMNAS_INDEXADOR = ("ipc", "oferta_interna_prov", "oferta_interna_def")
+
+# Palabras clave de las columnas de la hoja PRECIO SICEP, en orden de prioridad
+_CLAVES_COLUMNAS_SICEP = (
+    ("año", ("AÑO", "ANO", "YEAR")),
+    ("fncer", ("FNCER",)),
+    ("precio", ("PRECIO",))
+)
+
+def construir_mapas_indexadores(indexadores_df, proyeccion_df):
     """
-    Calcula el valor del numerador basado en reglas establecidas.
-    Usa la fecha correspondiente a cada registro.
+    Construye una sola vez los mapas año-mes -> valor de cada columna de indexadores,
+    para que los cálculos de numerador y denominador no recorran los DataFrames en cada consulta.
+    Los valores de INDEXADORES tienen prioridad sobre los de la proyección.
     
     Args:
-        fecha (datetime.date): Fecha para la que se calcula el numerador
-        indexador (str): Tipo de indexador (ej. "IPC")
-        numerador (str): Tipo de numerador ("PROVISIONAL" o "DEFINITIVO")
         indexadores_df (DataFrame): DataFrame con datos de indexadores
         proyeccion_df (DataFrame): DataFrame con proyecciones de indexadores
         
     Returns:
-        float: Valor del numerador calculado, o None si no se pudo calcular
+        dict: Diccionario {columna: {periodo: valor}} para ipc, oferta_interna_prov y oferta_interna_def,
+            donde periodo es el ordinal entero del mes (ver _clave_mes)
     """
-    fecha_ano_mes = fecha_a_texto(fecha)
+    mapas = {columna: {} for columna in _COLUMNAS_INDEXADOR}
+    
+    # La proyección se carga primero para que INDEXADORES la sobrescriba;
+    # dentro de cada hoja se conserva la primera fila de cada mes
+    for df in (proyeccion_df, indexadores_df):
+        claves = pd.Series(pd.PeriodIndex(pd.to_datetime(df['fechaoperacion']), freq='M').asi8, index=df.index)
+        primeras = ~claves.duplicated()
+        for columna in _COLUMNAS_INDEXADOR:
+            mapas[columna].update(zip(claves[primeras].tolist(), df.loc[primeras, columna]))
     
-    # Convertir fechas a formato año-mes para comparación
-    indexadores_df['fecha_str'] = indexadores_df['fechaoperacion'].apply(fecha_a_texto)
-    proyeccion_df['fecha_str'] = proyeccion_df['fechaoperacion'].apply(fecha_a_texto)
+    return mapas
+
+def _clave_mes(fecha):
+    """
+    Obtiene la clave entera del mes de una fecha, usada en los mapas de indexadores.
     
-    valor = None
+    Args:
+        fecha (datetime.date): Fecha a convertir
+        
+    Returns:
+        int: Ordinal del periodo mensual de la fecha
+    """
+    return pd.Period(fecha, freq='M').ordinal
+
+def _columna_indexador(indexador, tipo):
+    """
+    Determina la columna de indexadores que corresponde a un numerador o denominador.
     
+    Args:
+        indexador (str): Tipo de indexador (ej. "IPC")
+        tipo (str): Tipo de numerador/denominador ("PROVISIONAL" o "DEFINITIVO")
+        
+    Returns:
+        str: Nombre de la columna (ipc, oferta_interna_prov u oferta_interna_def)
+    """
     if indexador == "IPC":
-        valor = indexadores_df.loc[indexadores_df['fecha_str'] == fecha_ano_mes, 'ipc']
-        if valor.empty:
-            valor = proyeccion_df.loc[proyeccion_df['fecha_str'] == fecha_ano_mes, 'ipc']
-    elif indexador != "IPC" and numerador == "PROVISIONAL":
-        valor = indexadores_df.loc[indexadores_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_prov']
-        if valor.empty:
-            valor = proyeccion_df.loc[proyeccion_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_prov']
-    elif indexador != "IPC" and numerador == "DEFINITIVO":
-        valor = indexadores_df.loc[indexadores_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_def']
-        if valor.empty:
-            valor = proyeccion_df.loc[proyeccion_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_def']
-    
-    return valor.iloc[0] if not valor.empty else None
+        return "ipc"
+    if tipo == "PROVISIONAL":
+        return "oferta_interna_prov"
+    if tipo == "DEFINITIVO":
+        return "oferta_interna_def"
+    raise ValueError(f"Tipo de numerador/denominador no reconocido: {tipo}")
+
+def calcular_numerador(fecha, indexador, numerador, mapas):
+    """
+    Calcula el valor del numerador basado en reglas establecidas.
+    Usa la fecha correspondiente a cada registro.
+    
+    Args:
+        fecha (datetime.date): Fecha para la que se calcula el numerador
+        indexador (str): Tipo de indexador (ej. "IPC")
+        numerador (str): Tipo de numerador ("PROVISIONAL" o "DEFINITIVO")
+        mapas (dict): Mapas de indexadores creados con construir_mapas_indexadores
+        
+    Returns:
+        float: Valor del numerador calculado, o None si no se pudo calcular
+    """
+    return mapas[_columna_indexador(indexador, numerador)].get(_clave_mes(fecha))
 
-def calcular_denominador(fecha_base, indexador, denominador, indexadores_df, proyeccion_df):
+def calcular_denominador(fecha_base, indexador, denominador, mapas):
     """
     Calcula el valor del denominador basado en reglas establecidas.
     Usa la fecha base (no la fecha de iteración).
@@ -71,34 +113,33 @@ def calcular_denominador(fecha_base, indexador, denominador, indexadores_df, pro
         fecha_base (datetime.date): Fecha base para el cálculo
         indexador (str): Tipo de indexador (ej. "IPC")
         denominador (str): Tipo de denominador ("PROVISIONAL" o "DEFINITIVO")
-        indexadores_df (DataFrame): DataFrame con datos de indexadores
-        proyeccion_df (DataFrame): DataFrame con proyecciones de indexadores
+        mapas (dict): Mapas de indexadores creados con construir_mapas_indexadores
         
     Returns:
         float: Valor del denominador calculado, o None si no se pudo calcular
     """
-    fecha_ano_mes = fecha_a_texto(fecha_base)
-    
-    # Convertir fechas a formato año-mes para comparación
-    indexadores_df['fecha_str'] = indexadores_df['fechaoperacion'].apply(fecha_a_texto)
-    proyeccion_df['fecha_str'] = proyeccion_df['fechaoperacion'].apply(fecha_a_texto)
-    
-    valor = None
+    return mapas[_columna_indexador(indexador, denominador)].get(_clave_mes(fecha_base))
+
+def _proyectar_mensual(valor_base, var_mensual, meses):
+    """
+    Proyecta un valor aplicando la variación mensual de forma acumulada.
+    El crecimiento se multiplica mes a mes en el mismo orden que la proyección
+    iterativa y cada valor se redondea con round() de Python sobre floats, como en
+    esa proyección, para que los casos de empate (p. ej. 285.635) den el mismo resultado.
     
-    if indexador == "IPC":
-        valor = indexadores_df.loc[indexadores_df['fecha_str'] == fecha_ano_mes, 'ipc']
-        if valor.empty:
-            valor = proyeccion_df.loc[proyeccion_df['fecha_str'] == fecha_ano_mes, 'ipc']
-    elif indexador != "IPC" and denominador == "PROVISIONAL":
-        valor = indexadores_df.loc[indexadores_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_prov']
-        if valor.empty:
-            valor = proyeccion_df.loc[proyeccion_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_prov']
-    elif indexador != "IPC" and denominador == "DEFINITIVO":
-        valor = indexadores_df.loc[indexadores_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_def']
-        if valor.empty:
-            valor = proyeccion_df.loc[proyeccion_df['fecha_str'] == fecha_ano_mes, 'oferta_interna_def']
-    
-    return valor.iloc[0] if not valor.empty else None
+    Args:
+        valor_base (float): Valor del primer mes
+        var_mensual (float): Variación mensual
+        meses (int): Número de meses a proyectar
+        
+    Returns:
+        ndarray: Valores proyectados redondeados a 2 decimales
+    """
+    if meses == 0:
+        return np.empty(0)
+    valores = np.full(meses, 1 + var_mensual)
+    valores[0] = valor_base
+    return np.array([round(valor, 2) for valor in np.multiply.accumulate(valores).tolist()])
 
 def crear_proyeccion_indexadores(datos_iniciales=DATOS_INICIALES, carpeta_ofertas=None):
     """
@@ -162,7 +203,7 @@ def crear_proyeccion_indexadores(datos_iniciales=DATOS_INICIALES, carpeta_oferta
             return False
         
         # Convertir columnas de fechas
-        indexadores_df['fechaoperacion'] = pd.to_datetime(indexadores_df['fechaoperacion'], format="%d/%m/%Y").dt.date
+        indexadores_df['fechaoperacion'] = pd.to_datetime(indexadores_df['fechaoperacion'], format="%d/%m/%Y")
         
         # Obtener la última fecha de indexadores 
         fecha_mayor_indexadores = indexadores_df['fechaoperacion'].max()
@@ -174,7 +215,7 @@ def crear_proyeccion_indexadores(datos_iniciales=DATOS_INICIALES, carpeta_oferta
         ipc = fila_base['ipc']
         
         # Fecha de inicio para la proyección
-        fecha_inicio = fecha_mayor_indexadores
+        fecha_inicio = fecha_mayor_indexadores.date()
     else:
         # Convertir columnas de fechas de la proyección existente
         proyeccion_anterior_df['fechaoperacion'] = pd.to_datetime(proyeccion_anterior_df['fechaoperacion']).dt.date
@@ -194,9 +235,8 @@ def crear_proyeccion_indexadores(datos_iniciales=DATOS_INICIALES, carpeta_oferta
         else:
             fecha_inicio = fecha_mayor_proyeccion.replace(month=fecha_mayor_proyeccion.month + 1)
     
-    # Convertir fecha de la demanda
-    cantidad_df['FECHA'] = pd.to_datetime(cantidad_df['FECHA'], format="%d/%m/%Y").dt.date
-    fecha_mayor_cantidad = cantidad_df['FECHA'].max()
+    # Obtener la última fecha de la demanda
+    fecha_mayor_cantidad = pd.to_datetime(cantidad_df['FECHA'], format="%d/%m/%Y").max().date()
     
     # Si la fecha de demanda es anterior a la última fecha proyectada, no hay que hacer nada
     if usar_proyeccion_existente and fecha_mayor_cantidad <= fecha_mayor_proyeccion:
@@ -214,46 +254,28 @@ def crear_proyeccion_indexadores(datos_iniciales=DATOS_INICIALES, carpeta_oferta
     # Calcular variación mensual aproximada
     var_mensual = (1 + crecimiento_anual / 100) ** (1 / 12) - 1
     
-    # Iniciar proyección
-    proyeccion_data = []
-    
-    # Si ya existe una proyección, incluir todos sus registros existentes
-    if usar_proyeccion_existente:
-        for _, row in proyeccion_anterior_df.iterrows():
-            proyeccion_data.append({
-                "fechaoperacion": row['fechaoperacion'],
-                "oferta_interna_prov": row['oferta_interna_prov'],
-                "oferta_interna_def": row['oferta_interna_def'],
-                "ipc": row['ipc']
-            })
-    
-    # Proyectar mes a mes desde la fecha de inicio hasta la fecha máxima de demanda
-    fecha_actual = fecha_inicio
-    
-    while fecha_actual <= fecha_mayor_cantidad:
-        proyeccion_data.append({
-            "fechaoperacion": fecha_actual,
-            "oferta_interna_prov": round(oferta_interna_prov, 2),
-            "oferta_interna_def": round(oferta_interna_def, 2),
-            "ipc": round(ipc, 2)
-        })
-        
-        # Actualizar valores para el siguiente mes
-        oferta_interna_prov *= (1 + var_mensual)
-        oferta_interna_def *= (1 + var_mensual)
-        ipc *= (1 + var_mensual)
-        
-        # Avanzar al primer día del mes siguiente
-        fecha_actual = (fecha_actual + timedelta(days=31)).replace(day=1)
+    # Fechas a proyectar: la fecha de inicio y el primer día de cada mes siguiente
+    # hasta la fecha máxima de demanda
+    fechas = []
+    if fecha_inicio <= fecha_mayor_cantidad:
+        fecha_siguiente = (fecha_inicio + timedelta(days=31)).replace(day=1)
+        fechas = [fecha_inicio, *pd.date_range(fecha_siguiente, fecha_mayor_cantidad, freq='MS').date]
     
     # Crear DataFrame con proyección
-    proyeccion_df = pd.DataFrame(proyeccion_data)
+    proyeccion_df = pd.DataFrame({
+        "fechaoperacion": fechas,
+        "oferta_interna_prov": _proyectar_mensual(oferta_interna_prov, var_mensual, len(fechas)),
+        "oferta_interna_def": _proyectar_mensual(oferta_interna_def, var_mensual, len(fechas)),
+        "ipc": _proyectar_mensual(ipc, var_mensual, len(fechas))
+    })
     
-    # Eliminar la hoja existente si es necesario
-    if hoja_existente:
-        eliminar_hoja_si_existe(datos_iniciales, "PROYECCIÓN INDEXADORES")
+    # Si ya existe una proyección, incluir todos sus registros existentes
+    if usar_proyeccion_existente:
+        columnas = ["fechaoperacion", "oferta_interna_prov", "oferta_interna_def", "ipc"]
+        proyeccion_df = pd.concat([proyeccion_anterior_df[columnas], proyeccion_df], ignore_index=True)
     
-    # Guardar en el archivo
+    # Guardar en el archivo; si la hoja ya existe se reemplaza en su lugar,
+    # sin reescribir el libro una vez más para eliminarla
     resultado = guardar_excel_seguro(
         proyeccion_df, 
         datos_iniciales, 
@@ -269,6 +291,38 @@ def crear_proyeccion_indexadores(datos_iniciales=DATOS_INICIALES, carpeta_oferta
     
     return resultado
 
+def _proyectar_precio_mensual(precio_inicial, ipps, ipps_redondeados, reinicios, precios_reinicio):
+    """
+    Proyecta un precio mes a mes según la variación del IPP respecto al mes anterior.
+    En los meses marcados como reinicio se toma el precio ya calculado para ese mes.
+    
+    Los precios mensuales son float de numpy y se redondean con np.round, la misma regla
+    que se usa para el IPP y los precios de reinicio (es la que aplica round() a un valor
+    de numpy); solo el precio inicial, que llega como float de Python, usa round().
+    
+    Args:
+        precio_inicial (float): Precio del primer mes (fecha base)
+        ipps (ndarray): IPP de cada mes
+        ipps_redondeados (ndarray): IPP de cada mes redondeado a 2 decimales
+        reinicios (ndarray): Máscara booleana de los meses que toman precios_reinicio
+        precios_reinicio (ndarray): Precio de cada mes de reinicio
+        
+    Returns:
+        ndarray: Precios proyectados redondeados a 2 decimales
+    """
+    precios = np.empty(len(ipps))
+    precios[0] = round(precio_inicial, 2)
+    
+    # Cada precio se redondea a partir del precio ya redondeado del mes anterior,
+    # por lo que la proyección es secuencial
+    for i in range(1, len(ipps)):
+        if reinicios[i]:
+            precios[i] = precios_reinicio[i]
+        else:
+            precios[i] = np.round(precios[i - 1] * (ipps[i] / ipps_redondeados[i - 1]), 2)
+    
+    return precios
+
 def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
     """
     Crea o actualiza la hoja 'PROYECCIÓN PRECIO SICEP' en el archivo de datos iniciales,
@@ -288,30 +342,37 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
         logger.error(f"No se encontró el archivo de datos iniciales: {datos_iniciales}")
         return False
     
-    # Eliminar la hoja si ya existe
-    eliminar_hoja_si_existe(datos_iniciales, "PROYECCIÓN PRECIO SICEP")
+    # Leer las tres hojas de entrada abriendo el libro una sola vez
+    try:
+        with pd.ExcelFile(datos_iniciales) as libro_datos:
+            # Precios SICEP anuales, sin conversión automática
+            sicep_anual_df = leer_excel_seguro(libro_datos, "PRECIO SICEP", dtype=str)
+            indexadores_df = leer_excel_seguro(libro_datos, "INDEXADORES")
+            proyeccion_indexadores_df = leer_excel_seguro(libro_datos, "PROYECCIÓN INDEXADORES")
+    except Exception as e:
+        logger.error(f"Error al abrir {datos_iniciales}: {e}")
+        return False
     
-    # Leer los datos de precios SICEP (precios anuales)
+    # Procesar los datos de precios SICEP (precios anuales)
     try:
-        # Leer sin conversión automática
-        sicep_anual_df = leer_excel_seguro(datos_iniciales, "PRECIO SICEP", dtype=str)
         if sicep_anual_df.empty:
             logger.error("No se pudo leer la hoja PRECIO SICEP con los datos anuales")
             return False
         
-        # Buscar columnas de año, precio y precio FNCER
-        año_col = None
-        precio_col = None
-        precio_fncer_col = None
-        
+        # Buscar columnas de año, precio y precio FNCER: cada columna se clasifica una vez
+        # con el primer tipo cuyas palabras clave contiene; si varias columnas son del
+        # mismo tipo se usa la última
+        columnas_sicep = {}
         for col_name in sicep_anual_df.columns:
             col_str = str(col_name).upper()
-            if "AÑO" in col_str or "ANO" in col_str or "YEAR" in col_str:
-                año_col = col_name
-            elif "SICEP FNCER" in col_str or "FNCER" in col_str:
-                precio_fncer_col = col_name
-            elif "PRECIO" in col_str:
-                precio_col = col_name
+            tipo = next((tipo for tipo, claves in _CLAVES_COLUMNAS_SICEP
+                         if any(clave in col_str for clave in claves)), None)
+            if tipo is not None:
+                columnas_sicep[tipo] = col_name
+        
+        año_col = columnas_sicep.get("año")
+        precio_col = columnas_sicep.get("precio")
+        precio_fncer_col = columnas_sicep.get("fncer")
         
         # Si no se encontraron, usar las columnas adecuadas
         if año_col is None:
@@ -333,76 +394,54 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
             print("No se encontró columna FNCER, solo se calculará proyección para SICEP")
         
         # Mostrar el dataframe para depuración
-        print("DEBUG - Contenido completo de la hoja PRECIO SICEP (antes de limpiar):")
-        print(sicep_anual_df)
-        
-        # Limpiar los datos manualmente
-        # Eliminar filas completamente vacías
-        sicep_anual_df = sicep_anual_df.dropna(how='all')
-        
-        # Reemplazar valores vacíos o nan en la columna de año
-        for idx in range(len(sicep_anual_df)):
-            if pd.isna(sicep_anual_df.iloc[idx][año_col]) or sicep_anual_df.iloc[idx][año_col] == '':
-                # Si hay valor en la columna de precio, intentar inferir el año
-                if idx > 0 and pd.notna(sicep_anual_df.iloc[idx][precio_col]):
-                    try:
-                        # Inferir el año sumando 1 al año anterior
-                        año_anterior = int(float(sicep_anual_df.iloc[idx-1][año_col]))
-                        sicep_anual_df.iloc[idx, sicep_anual_df.columns.get_loc(año_col)] = str(año_anterior + 1)
-                        print(f"DEBUG - Año inferido para fila {idx}: {año_anterior + 1}")
-                    except Exception as e:
-                        print(f"DEBUG - Error al inferir año: {e}")
-        
-        print("DEBUG - Contenido después de limpiar:")
-        print(sicep_anual_df)
-        
-        # Extraer los precios por año manualmente
-        precios_por_año = {}
+        if logger.getEffectiveLevel() <= logging.DEBUG:
+            logger.debug(f"Contenido completo de la hoja PRECIO SICEP (antes de limpiar):\n{sicep_anual_df}")
+        
+        # Limpiar los datos: eliminar filas completamente vacías
+        sicep_anual_df = sicep_anual_df.dropna(how='all').reset_index(drop=True)
+        
+        # Convertir las columnas una sola vez; los valores no numéricos quedan como NaN
+        años_texto = sicep_anual_df[año_col].str.strip()
+        años = pd.to_numeric(años_texto, errors='coerce')
+        precios = pd.to_numeric(sicep_anual_df[precio_col].str.strip(), errors='coerce')
+        precios_invalidos = sicep_anual_df[precio_col].notna() & precios.isna()
+        
+        # Inferir los años vacíos sumando 1 al año anterior cuando la fila tiene precio.
+        # Cada bloque de filas inferibles continúa desde la fila anterior al bloque.
+        # Solo cuentan como vacías las celdas sin valor o con texto vacío; las que solo
+        # tienen espacios no se infieren y más abajo se descartan
+        inferibles = (
+            sicep_anual_df[año_col].isna() | (sicep_anual_df[año_col] == '')
+        ) & sicep_anual_df[precio_col].notna()
+        inferibles.iloc[:1] = False
+        bloques = (~inferibles).cumsum()
+        año_inicial_bloque = pd.Series(np.trunc(años[~inferibles]).to_numpy(), index=bloques[~inferibles].to_numpy())
+        años = años.mask(inferibles, bloques.map(año_inicial_bloque) + inferibles.groupby(bloques).cumsum())
+        
+        inferidos = inferibles & años.notna()
+        if inferidos.any():
+            sicep_anual_df.loc[inferidos, año_col] = años[inferidos].astype(int).astype(str)
+            if logger.getEffectiveLevel() <= logging.DEBUG:
+                logger.debug(f"Años inferidos: {años[inferidos].astype(int).tolist()}")
+        
+        if logger.getEffectiveLevel() <= logging.DEBUG:
+            logger.debug(f"Contenido después de limpiar:\n{sicep_anual_df}")
+        
+        # Filas con año numérico; las que tienen un año no numérico y precio toman
+        # el año 2025 + posición (año inicial conocido)
+        posiciones = pd.Series(np.arange(len(sicep_anual_df)), index=años.index)
+        alternativos = años_texto.notna() & (años_texto != '') & años.isna() & precios.notna() & (posiciones > 0)
+        años = años.mask(alternativos, 2025 + posiciones)
+        validos = (años.notna() & ~precios_invalidos) | alternativos
+        
+        # Extraer los precios por año
+        precios_por_año = dict(zip(años[validos].astype(int).tolist(), precios[validos].tolist()))
         precios_fncer_por_año = {}
         
-        for idx in range(len(sicep_anual_df)):
-            try:
-                # Obtener valores de las celdas como strings
-                año_str = str(sicep_anual_df.iloc[idx][año_col]).strip()
-                precio_str = str(sicep_anual_df.iloc[idx][precio_col]).strip()
-                
-                # Intentar convertir a entero/float
-                if año_str and año_str.lower() != 'nan' and año_str != 'NaN':
-                    try:
-                        año = int(float(año_str))
-                        precio = float(precio_str)
-                        precios_por_año[año] = precio
-                        print(f"DEBUG - Extraído año {año} con precio {precio}")
-                        
-                        # Para FNCER
-                        if tiene_fncer:
-                            fncer_str = str(sicep_anual_df.iloc[idx][precio_fncer_col]).strip()
-                            if fncer_str and fncer_str.lower() != 'nan':
-                                precio_fncer = float(fncer_str)
-                                precios_fncer_por_año[año] = precio_fncer
-                                print(f"DEBUG - Extraído FNCER para año {año}: {precio_fncer}")
-                    except ValueError as ve:
-                        print(f"DEBUG - Error al convertir valores en fila {idx}: {ve}")
-                        # Intenta inferir el año directamente del índice (2025 + idx)
-                        if idx > 0 and precio_str and precio_str.lower() != 'nan':
-                            try:
-                                año_base = 2025  # Año inicial conocido
-                                año_inferido = año_base + idx
-                                precio = float(precio_str)
-                                precios_por_año[año_inferido] = precio
-                                print(f"DEBUG - Año inferido alternativo: {año_inferido} con precio {precio}")
-                                
-                                # Para FNCER
-                                if tiene_fncer:
-                                    fncer_str = str(sicep_anual_df.iloc[idx][precio_fncer_col]).strip()
-                                    if fncer_str and fncer_str.lower() != 'nan':
-                                        precio_fncer = float(fncer_str)
-                                        precios_fncer_por_año[año_inferido] = precio_fncer
-                                        print(f"DEBUG - Extraído FNCER para año inferido {año_inferido}: {precio_fncer}")
-                            except Exception as e:
-                                print(f"DEBUG - Falló la inferencia alternativa para fila {idx}: {e}")
-            except Exception as e:
-                print(f"DEBUG - Error procesando fila {idx}: {e}")
+        if tiene_fncer:
+            precios_fncer = pd.to_numeric(sicep_anual_df[precio_fncer_col].str.strip(), errors='coerce')
+            validos_fncer = validos & precios_fncer.notna()
+            precios_fncer_por_año = dict(zip(años[validos_fncer].astype(int).tolist(), precios_fncer[validos_fncer].tolist()))
         
         if not precios_por_año:
             # Si aún no hay años extraídos, intentar un último método
@@ -418,7 +457,7 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
                             if precio_str and precio_str.lower() != 'nan':
                                 precio = float(precio_str)
                                 precios_por_año[año] = precio
-                                print(f"DEBUG - Forzado: Año {año} con precio {precio}")
+                                logger.debug(f"Forzado: Año {año} con precio {precio}")
                                 
                                 # Para FNCER
                                 if tiene_fncer:
@@ -426,11 +465,11 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
                                     if fncer_str and fncer_str.lower() != 'nan':
                                         precio_fncer = float(fncer_str)
                                         precios_fncer_por_año[año] = precio_fncer
-                                        print(f"DEBUG - Forzado: FNCER para año {año}: {precio_fncer}")
+                                        logger.debug(f"Forzado: FNCER para año {año}: {precio_fncer}")
                         except Exception as e:
-                            print(f"DEBUG - Falló el método forzado para fila {idx}: {e}")
+                            logger.debug(f"Falló el método forzado para fila {idx}: {e}")
             except Exception as e:
-                print(f"DEBUG - Error en el método forzado: {e}")
+                logger.debug(f"Error en el método forzado: {e}")
         
         if not precios_por_año:
             logger.error("No se encontraron precios válidos en la hoja PRECIO SICEP")
@@ -439,11 +478,12 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
         logger.info(f"Precios por año: {precios_por_año}")
         print(f"Precios por año encontrados: {precios_por_año}")
         
-        # DEBUG - Imprimir precios por año para verificación
-        for año, precio in precios_por_año.items():
-            print(f"DEBUG - Precio base para año {año}: {precio}")
-            if tiene_fncer and año in precios_fncer_por_año:
-                print(f"DEBUG - Precio FNCER base para año {año}: {precios_fncer_por_año[año]}")
+        # Registrar precios por año para verificación
+        if logger.getEffectiveLevel() <= logging.DEBUG:
+            for año, precio in precios_por_año.items():
+                logger.debug(f"Precio base para año {año}: {precio}")
+                if tiene_fncer and año in precios_fncer_por_año:
+                    logger.debug(f"Precio FNCER base para año {año}: {precios_fncer_por_año[año]}")
         
         if tiene_fncer:
             logger.info(f"Precios FNCER por año: {precios_fncer_por_año}")
@@ -454,21 +494,19 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
         print(f"Error al leer PRECIO SICEP: {e}")
         return False
     
-    # Leer indexadores y proyección
+    # Validar indexadores y proyección
     try:
-        indexadores_df = leer_excel_seguro(datos_iniciales, "INDEXADORES")
         if indexadores_df.empty:
             logger.error("No se pudo leer la hoja INDEXADORES")
             return False
         
-        proyeccion_indexadores_df = leer_excel_seguro(datos_iniciales, "PROYECCIÓN INDEXADORES")
         if proyeccion_indexadores_df.empty:
             logger.error("No se pudo leer la hoja PROYECCIÓN INDEXADORES")
             return False
         
         # Convertir fechas
-        indexadores_df['fechaoperacion'] = pd.to_datetime(indexadores_df['fechaoperacion'], format="%d/%m/%Y", errors='coerce').dt.date
-        proyeccion_indexadores_df['fechaoperacion'] = pd.to_datetime(proyeccion_indexadores_df['fechaoperacion'], format="%d/%m/%Y", errors='coerce').dt.date
+        indexadores_df['fechaoperacion'] = pd.to_datetime(indexadores_df['fechaoperacion'], format="%d/%m/%Y", errors='coerce')
+        proyeccion_indexadores_df['fechaoperacion'] = pd.to_datetime(proyeccion_indexadores_df['fechaoperacion'], format="%d/%m/%Y", errors='coerce')
     except Exception as e:
         logger.error(f"Error al leer indexadores: {e}")
         return False
@@ -490,18 +528,17 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
         logger.error(f"Formato de fecha incorrecto: {fecha_base_str}")
         return False
     
-    # Obtener el IPP base
-    ipp_base = None
+    # IPP (oferta_interna_prov) por fecha, construido una sola vez. INDEXADORES va primero
+    # para que tenga prioridad sobre la proyección; en cada fecha se conserva la primera fila
+    ipp_por_fecha = (
+        pd.concat([indexadores_df, proyeccion_indexadores_df])
+        .dropna(subset=['fechaoperacion'])
+        .drop_duplicates(subset='fechaoperacion')
+        .set_index('fechaoperacion')['oferta_interna_prov']
+    )
     
-    # Buscar en indexadores
-    base_en_indexadores = indexadores_df[indexadores_df['fechaoperacion'] == fecha_base]
-    if not base_en_indexadores.empty:
-        ipp_base = base_en_indexadores['oferta_interna_prov'].iloc[0]
-    else:
-        # Buscar en proyección
-        base_en_proyeccion = proyeccion_indexadores_df[proyeccion_indexadores_df['fechaoperacion'] == fecha_base]
-        if not base_en_proyeccion.empty:
-            ipp_base = base_en_proyeccion['oferta_interna_prov'].iloc[0]
+    # Obtener el IPP base
+    ipp_base = ipp_por_fecha.get(pd.Timestamp(fecha_base))
     
     if ipp_base is None:
         logger.error(f"No se encontró el IPP base para la fecha {fecha_base}")
@@ -556,133 +593,60 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
         logger.info(f"Precio FNCER base para {fecha_base}: {precio_fncer_base}")
         print(f"Precio FNCER base para {fecha_base}: {precio_fncer_base}")
     
-    # Determinar el rango de fechas
-    fecha_min = fecha_base  # La fecha mínima es la fecha base
-    fecha_max = max(proyeccion_indexadores_df['fechaoperacion'])
-    
-    # Crear proyección de precios
-    proyeccion_sicep = []
-    
-    # Variables para mantener el seguimiento del último precio ajustado por año
-    ultimo_año_procesado = año_base
-    
-    # Primer registro (fecha base)
-    primer_registro = {
-        "FECHA": fecha_base,
-        "IPP": round(ipp_base, 2),
-        "PRECIO": round(precio_base, 2)
-    }
+    # Meses a proyectar: el primer día de cada mes desde el mes siguiente a la fecha base
+    # hasta la fecha máxima de la proyección; los meses sin IPP se omiten
+    fecha_max = proyeccion_indexadores_df['fechaoperacion'].max()
+    meses = pd.date_range(pd.Timestamp(fecha_base) + pd.offsets.MonthBegin(1), fecha_max, freq='MS')
+    meses_con_ipp = meses.isin(ipp_por_fecha.index)
+    for fecha_sin_ipp in meses[~meses_con_ipp].date:
+        logger.warning(f"No se encontró IPP para fecha {fecha_sin_ipp}, saltando...")
+    
+    # Registros de la proyección: la fecha base seguida de los meses con IPP
+    fechas_mes = pd.DatetimeIndex([pd.Timestamp(fecha_base)]).append(meses[meses_con_ipp])
+    ipps = np.concatenate(([ipp_base], ipp_por_fecha.reindex(meses[meses_con_ipp]).to_numpy()))
+    # Todos los valores derivados del IPP se redondean con np.round (ver _proyectar_precio_mensual)
+    ipps_mes = np.round(ipps, 2)
+    años_mes = pd.Series(fechas_mes.year)
+    
+    # Un mes cambia de año cuando su año es distinto al del registro anterior
+    cambios_año = (años_mes != años_mes.shift(fill_value=año_base)).to_numpy()
+    
+    if logger.getEffectiveLevel() <= logging.DEBUG:
+        for año_siguiente in años_mes[cambios_año]:
+            logger.debug(f"Cambio a año {año_siguiente}")
+    
+    # En el cambio de año se toma el precio exacto del año de la tabla PRECIO SICEP con el
+    # IPP BASE FIJO, como en la fórmula de Excel =REDONDEAR.MAS($B$3*G24/$G$17;2) donde $G$17
+    # es el IPP base fijo; si el año no tiene precio se sigue proyectando desde el mes anterior
+    reinicia_sicep = cambios_año & años_mes.isin(list(precios_por_año)).to_numpy()
+    precios_año = años_mes.map(precios_por_año).to_numpy(dtype=float)
+    precios_mes = _proyectar_precio_mensual(
+        precio_base, ipps, ipps_mes, reinicia_sicep,
+        np.round(precios_año * (ipps / ipp_base_fijo), 2)
+    )
     
-    # Añadir precio FNCER si corresponde
     if tiene_fncer:
-        primer_registro["PRECIO FNCER"] = round(precio_fncer_base, 2)
-    
-    proyeccion_sicep.append(primer_registro)
-    
-    # Generar meses siguientes
-    fecha_actual = fecha_base
-    if fecha_actual.month == 12:
-        fecha_siguiente = fecha_actual.replace(year=fecha_actual.year + 1, month=1)
-    else:
-        fecha_siguiente = fecha_actual.replace(month=fecha_actual.month + 1)
-    
-    while fecha_siguiente <= fecha_max:
-        # Obtener IPP para la fecha siguiente
-        ipp_siguiente = None
-        
-        # Buscar en indexadores
-        siguiente_en_indexadores = indexadores_df[indexadores_df['fechaoperacion'] == fecha_siguiente]
-        if not siguiente_en_indexadores.empty:
-            ipp_siguiente = siguiente_en_indexadores['oferta_interna_prov'].iloc[0]
-        else:
-            # Buscar en proyección
-            siguiente_en_proyeccion = proyeccion_indexadores_df[proyeccion_indexadores_df['fechaoperacion'] == fecha_siguiente]
-            if not siguiente_en_proyeccion.empty:
-                ipp_siguiente = siguiente_en_proyeccion['oferta_interna_prov'].iloc[0]
-        
-        if ipp_siguiente is None:
-            logger.warning(f"No se encontró IPP para fecha {fecha_siguiente}, saltando...")
-            # Avanzar al siguiente mes
-            fecha_actual = fecha_siguiente
-            if fecha_actual.month == 12:
-                fecha_siguiente = fecha_actual.replace(year=fecha_actual.year + 1, month=1)
-            else:
-                fecha_siguiente = fecha_actual.replace(month=fecha_actual.month + 1)
-            continue
-        
-        # Verificar si cambiamos de año
-        nuevo_registro = {"FECHA": fecha_siguiente, "IPP": round(ipp_siguiente, 2)}
-        
-        if fecha_siguiente.year != ultimo_año_procesado:
-            # CAMBIO DE AÑO
-            año_siguiente = fecha_siguiente.year
-            print(f"DEBUG - Cambio a año {año_siguiente}")
-            ultimo_año_procesado = año_siguiente
-            
-            # Para el precio SICEP, buscar el precio para el nuevo año
-            if año_siguiente in precios_por_año:
-                # IMPORTANTE: Tomar el precio exacto del año de la tabla PRECIO SICEP
-                nuevo_precio_base = precios_por_año[año_siguiente]
-                print(f"DEBUG - Tomando precio base {nuevo_precio_base} para año {año_siguiente}")
-                
-                # USAR EL IPP BASE FIJO como en la fórmula de Excel =REDONDEAR.MAS($B$3*G24/$G$17;2)
-                # Donde $G$17 es el IPP base fijo
-                precio_siguiente = round(nuevo_precio_base * (ipp_siguiente / ipp_base_fijo), 2)
-                print(f"DEBUG - Cálculo: {nuevo_precio_base} * ({ipp_siguiente} / {ipp_base_fijo}) = {precio_siguiente}")
-                nuevo_registro["PRECIO"] = precio_siguiente
-            else:
-                # Si no hay precio para el nuevo año, proyectar a partir del último mes del año anterior
-                ultimo_ipp = proyeccion_sicep[-1]["IPP"]
-                precio_siguiente = round(proyeccion_sicep[-1]["PRECIO"] * (ipp_siguiente / ultimo_ipp), 2)
-                nuevo_registro["PRECIO"] = precio_siguiente
-            
-            # Para el precio FNCER, hacer lo mismo si está disponible
-            if tiene_fncer:
-                if año_siguiente in precios_fncer_por_año:
-                    # IMPORTANTE: Tomar el precio exacto FNCER del año de la tabla PRECIO SICEP
-                    nuevo_precio_fncer_base = precios_fncer_por_año[año_siguiente]
-                    print(f"DEBUG - Tomando precio FNCER base {nuevo_precio_fncer_base} para año {año_siguiente}")
-                    
-                    # USAR EL IPP BASE FIJO igual que para SICEP
-                    precio_fncer_siguiente = round(nuevo_precio_fncer_base * (ipp_siguiente / ipp_base_fijo), 2)
-                    print(f"DEBUG - Cálculo FNCER: {nuevo_precio_fncer_base} * ({ipp_siguiente} / {ipp_base_fijo}) = {precio_fncer_siguiente}")
-                    nuevo_registro["PRECIO FNCER"] = precio_fncer_siguiente
-                else:
-                    # Si no hay precio FNCER para el nuevo año, proyectar a partir del último mes del año anterior
-                    ultimo_ipp = proyeccion_sicep[-1]["IPP"]
-                    precio_fncer_siguiente = round(proyeccion_sicep[-1]["PRECIO FNCER"] * (ipp_siguiente / ultimo_ipp), 2)
-                    nuevo_registro["PRECIO FNCER"] = precio_fncer_siguiente
-        else:
-            # Proyección mensual dentro del mismo año
-            ultimo_ipp = proyeccion_sicep[-1]["IPP"]
-            
-            # Para SICEP
-            precio_siguiente = round(proyeccion_sicep[-1]["PRECIO"] * (ipp_siguiente / ultimo_ipp), 2)
-            nuevo_registro["PRECIO"] = precio_siguiente
-            
-            # Para FNCER si corresponde
-            if tiene_fncer:
-                precio_fncer_siguiente = round(proyeccion_sicep[-1]["PRECIO FNCER"] * (ipp_siguiente / ultimo_ipp), 2)
-                nuevo_registro["PRECIO FNCER"] = precio_fncer_siguiente
-        
-        # Agregar a la proyección
-        proyeccion_sicep.append(nuevo_registro)
-        
-        # Avanzar al siguiente mes
-        fecha_actual = fecha_siguiente
-        if fecha_actual.month == 12:
-            fecha_siguiente = fecha_actual.replace(year=fecha_actual.year + 1, month=1)
-        else:
-            fecha_siguiente = fecha_actual.replace(month=fecha_actual.month + 1)
-    
-    # Convertir a DataFrame
-    proyeccion_sicep_df = pd.DataFrame(proyeccion_sicep)
+        reinicia_fncer = cambios_año & años_mes.isin(list(precios_fncer_por_año)).to_numpy()
+        precios_fncer_año = años_mes.map(precios_fncer_por_año).to_numpy(dtype=float)
+        precios_fncer_mes = _proyectar_precio_mensual(
+            precio_fncer_base, ipps, ipps_mes, reinicia_fncer,
+            np.round(precios_fncer_año * (ipps / ipp_base_fijo), 2)
+        )
+    
+    # Convertir a DataFrame (las fechas se guardan como fechas, no como datetime)
+    proyeccion_sicep_df = pd.DataFrame({
+        "FECHA": fechas_mes.date,
+        "IPP": ipps_mes,
+        "PRECIO": precios_mes
+    })
+    if tiene_fncer:
+        proyeccion_sicep_df["PRECIO FNCER"] = precios_fncer_mes
     
     if proyeccion_sicep_df.empty:
         logger.error("No se generaron datos para la proyección de precios SICEP")
         return False
     
-    # Guardar en el archivo
+    # Guardar en el archivo, reemplazando en su lugar la hoja anterior si existe
     resultado = guardar_excel_seguro(
         proyeccion_sicep_df, 
         datos_iniciales, 
@@ -692,11 +656,11 @@ def crear_proyeccion_precio_sicep(datos_iniciales=DATOS_INICIALES):
     
     if resultado:
         if tiene_fncer:
-            logger.info(f"Proyección de precios SICEP y FNCER creada correctamente con {len(proyeccion_sicep)} registros")
-            print(f"Proyección de precios SICEP y FNCER creada correctamente con {len(proyeccion_sicep)} registros")
+            logger.info(f"Proyección de precios SICEP y FNCER creada correctamente con {len(proyeccion_sicep_df)} registros")
+            print(f"Proyección de precios SICEP y FNCER creada correctamente con {len(proyeccion_sicep_df)} registros")
         else:
-            logger.info(f"Proyección de precios SICEP creada correctamente con {len(proyeccion_sicep)} registros")
-            print(f"Proyección de precios SICEP creada correctamente con {len(proyeccion_sicep)} registros")
+            logger.info(f"Proyección de precios SICEP creada correctamente con {len(proyeccion_sicep_df)} registros")
+            print(f"Proyección de precios SICEP creada correctamente con {len(proyeccion_sicep_df)} registros")
     else:
         logger.error("Error al guardar la proyección de precios SICEP")
     
@@ -19,7 +19,12 @@ from core.utils import (
     solicitar_input_seguro,
     fecha_a_texto
 )
-from core.indexadores import calcular_numerador, calcular_denominador, crear_proyeccion_precio_sicep
+from core.indexadores import (
+    construir_mapas_indexadores,
+    calcular_numerador,
+    calcular_denominador,
+    crear_proyeccion_precio_sicep
+)
 
 logger = logging.getLogger(__name__)
 
@@ -62,8 +67,8 @@ def procesar_precio_sicep(datos_iniciales=DATOS_INICIALES):
             logger.error("La hoja PROYECCIÓN PRECIO SICEP está vacía")
             return None
         
-        # Convertir la columna FECHA a datetime.date
-        sicep_df['FECHA'] = pd.to_datetime(sicep_df['FECHA'], errors='coerce').dt.date
+        # Convertir la columna FECHA a datetime
+        sicep_df['FECHA'] = pd.to_datetime(sicep_df['FECHA'], errors='coerce')
         
         # Verificar si hay fechas inválidas
         if sicep_df['FECHA'].isna().any():
@@ -76,7 +81,7 @@ def procesar_precio_sicep(datos_iniciales=DATOS_INICIALES):
             return None
             
         # Crear columna auxiliar para agrupar por año-mes
-        sicep_df['AUX'] = sicep_df['FECHA'].apply(lambda d: f"{d.year}-{d.month}")
+        sicep_df['AUX'] = sicep_df['FECHA'].dt.year.astype(str) + "-" + sicep_df['FECHA'].dt.month.astype(str)
         
         # Crear diccionario simple con los valores de PRECIO
         sicep_dict = dict(zip(sicep_df['AUX'], sicep_df['PRECIO']))
@@ -127,8 +132,8 @@ def procesar_precio_bolsa(datos_iniciales=DATOS_INICIALES):
             logger.error("La hoja 'P BOLSA' está vacía")
             return None
         
-        # Convertir la columna FECHA a datetime.date
-        bolsa_df['FECHA'] = pd.to_datetime(bolsa_df['FECHA'], format="%d/%m/%Y", errors='coerce').dt.date
+        # Convertir la columna FECHA a datetime
+        bolsa_df['FECHA'] = pd.to_datetime(bolsa_df['FECHA'], format="%d/%m/%Y", errors='coerce')
         
         # Verificar si hay fechas inválidas
         if bolsa_df['FECHA'].isna().any():
@@ -137,7 +142,7 @@ def procesar_precio_bolsa(datos_iniciales=DATOS_INICIALES):
             bolsa_df = bolsa_df.dropna(subset=['FECHA'])
         
         # Crear columna auxiliar para agrupar por año-mes
-        bolsa_df['AUX'] = bolsa_df['FECHA'].apply(lambda d: f"{d.year}-{d.month}")
+        bolsa_df['AUX'] = bolsa_df['FECHA'].dt.year.astype(str) + "-" + bolsa_df['FECHA'].dt.month.astype(str)
         
         # Crear diccionario con los valores de PBNA
         bolsa_dict = dict(zip(bolsa_df['AUX'], bolsa_df['PBNA']))
@@ -320,9 +325,12 @@ def procesar_ofertas(carpeta_ofertas=OFERTAS_DIR, datos_iniciales=DATOS_INICIALE
         logger.error("No se pudo procesar PRECIO BOLSA")
         return False
     
-    # Convertir columnas de fechas a tipo datetime.date
-    indexadores_df['fechaoperacion'] = pd.to_datetime(indexadores_df['fechaoperacion'], format="%d/%m/%Y").dt.date
-    proyeccion_df['fechaoperacion'] = pd.to_datetime(proyeccion_df['fechaoperacion'], format="%d/%m/%Y").dt.date
+    # Convertir columnas de fechas a datetime (solo se usan para construir los mapas año-mes)
+    indexadores_df['fechaoperacion'] = pd.to_datetime(indexadores_df['fechaoperacion'], format="%d/%m/%Y")
+    proyeccion_df['fechaoperacion'] = pd.to_datetime(proyeccion_df['fechaoperacion'], format="%d/%m/%Y")
+    
+    # Mapas año-mes -> valor de indexadores, construidos una sola vez para todas las ofertas
+    mapas_indexadores = construir_mapas_indexadores(indexadores_df, proyeccion_df)
     
     # Inicializar listas para resultados
     tabla_maestra = []
@@ -335,11 +343,12 @@ def procesar_ofertas(carpeta_ofertas=OFERTAS_DIR, datos_iniciales=DATOS_INICIALE
         
         logger.info(f"Procesando oferta: {codigo_oferta}")
         
-        # Leer las hojas necesarias
+        # Leer las hojas necesarias abriendo el archivo una sola vez
         try:
-            indexador_df = leer_excel_seguro(ruta_archivo, "INDEXADOR")
-            cantidad_df = leer_excel_seguro(ruta_archivo, "cantidad")
-            precios_df = leer_excel_seguro(ruta_archivo, "precios")
+            with pd.ExcelFile(ruta_archivo) as libro_oferta:
+                indexador_df = leer_excel_seguro(libro_oferta, "INDEXADOR")
+                cantidad_df = leer_excel_seguro(libro_oferta, "cantidad")
+                precios_df = leer_excel_seguro(libro_oferta, "precios")
             
             if indexador_df.empty or cantidad_df.empty or precios_df.empty:
                 logger.error(f"Error al leer las hojas de {ruta_archivo}")
@@ -379,6 +388,18 @@ def procesar_ofertas(carpeta_ofertas=OFERTAS_DIR, datos_iniciales=DATOS_INICIALE
         # Determinar si esta oferta es de tipo FNCER
         es_fncer = indexador_data.get("FNCER", "NO") == "SI"
         
+        # El denominador solo depende de la fecha base de la oferta
+        try:
+            denominador_valor = calcular_denominador(
+                indexador_data["FECHA BASE"],
+                indexador_data["INDEXADOR"],
+                indexador_data["DENOMINADOR"],
+                mapas_indexadores
+            )
+        except Exception as e:
+            logger.error(f"Error al calcular el denominador de la oferta {codigo_oferta}: {e}")
+            continue
+        
         # Procesar cada fila de cantidad_df y cada hora
         for _, row in cantidad_df.iterrows():
             try:
@@ -392,29 +413,21 @@ def procesar_ofertas(carpeta_ofertas=OFERTAS_DIR, datos_iniciales=DATOS_INICIALE
                 # Construimos la clave año-mes para buscar en sicep_dict y bolsa_dict
                 fecha_aux = f"{fecha.year}-{fecha.month}"
                 
+                # El numerador y los precios de la fecha son los mismos para las 24 horas
+                numerador_valor = calcular_numerador(
+                    fecha,
+                    indexador_data["INDEXADOR"],
+                    indexador_data["NUMERADOR"],
+                    mapas_indexadores
+                )
+                precios_fecha = precios_df.loc[precios_df['FECHA'] == fecha]
+                
                 for hora in range(1, 25):
                     # Obtener precio para esta hora y fecha
-                    precio_hora = precios_df.loc[precios_df['FECHA'] == fecha, f"H{hora}"].values
+                    precio_hora = precios_fecha[f"H{hora}"].values
                     precio_hora = precio_hora[0] if len(precio_hora) > 0 else None
                     
-                    # Calcular numerador y denominador
                     try:
-                        numerador_valor = calcular_numerador(
-                            fecha,
-                            indexador_data["INDEXADOR"],
-                            indexador_data["NUMERADOR"],
-                            indexadores_df,
-                            proyeccion_df
-                        )
-                        
-                        denominador_valor = calcular_denominador(
-                            indexador_data["FECHA BASE"],
-                            indexador_data["INDEXADOR"],
-                            indexador_data["DENOMINADOR"],
-                            indexadores_df,
-                            proyeccion_df
-                        )
-                        
                         # Calcular precio indexado
                         if (
                             precio_hora is not None
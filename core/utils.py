@@ -137,6 +137,71 @@ def guardar_excel_seguro(df, archivo, hoja, index=False, **kwargs):
         logger.error(f"Error al guardar DataFrame en {archivo} (hoja: {hoja}): {e}")
         return False
 
+def abrir_libro_salida(archivo):
+    """
+    Abre el libro de openpyxl donde se agregarán hojas de salida.
+    
+    Si el archivo ya existe se carga para conservar sus demás hojas; si no existe
+    se crea un libro de solo escritura, que envía las filas a disco a medida que
+    se agregan en lugar de mantener todas las hojas en memoria.
+    
+    Args:
+        archivo (str o Path): Ruta al archivo Excel
+        
+    Returns:
+        Workbook: Libro listo para agregar hojas (se debe guardar con libro.save)
+    """
+    archivo = Path(archivo)
+    if archivo.exists():
+        return openpyxl.load_workbook(archivo)
+    
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    return openpyxl.Workbook(write_only=True)
+
+def escribir_hoja_df(libro, nombre_hoja, df, index=False, fila_titulo=None):
+    """
+    Escribe un DataFrame como una hoja de un libro de openpyxl, fila por fila.
+    
+    En un libro normal, si ya existe una hoja con el mismo nombre se reemplaza
+    conservando su posición. En un libro de solo escritura la hoja se agrega.
+    
+    Args:
+        libro (Workbook): Libro de openpyxl (normal o de solo escritura)
+        nombre_hoja (str): Nombre de la hoja a escribir
+        df (DataFrame): DataFrame a escribir
+        index (bool): Si se debe incluir el índice del DataFrame como primera columna
+        fila_titulo (list, opcional): Fila que se escribe entre el encabezado y los datos,
+            sin agregarla al DataFrame
+    """
+    posicion = None
+    if not libro.write_only and nombre_hoja in libro.sheetnames:
+        posicion = libro.sheetnames.index(nombre_hoja)
+        libro.remove(libro[nombre_hoja])
+    hoja = libro.create_sheet(nombre_hoja, posicion)
+    
+    # Encabezado
+    encabezado = list(df.columns)
+    if index:
+        encabezado.insert(0, df.index.name)
+    hoja.append(encabezado)
+    
+    if fila_titulo is not None:
+        hoja.append([None, *fila_titulo] if index else list(fila_titulo))
+    
+    # Las celdas vacías (NaN/NaT) se escriben como None. Solo se convierte el DataFrame
+    # a objetos si alguna columna tiene nulos (hasnans evita construir la máscara completa)
+    if any(df.iloc[:, i].hasnans for i in range(df.shape[1])):
+        df = df.astype(object).where(df.notna(), None)
+    
+    # Filas como listas de escalares de Python obtenidas directamente del arreglo de numpy
+    filas = df.to_numpy(dtype=object).tolist()
+    if index:
+        for etiqueta, fila in zip(df.index.tolist(), filas):
+            hoja.append([etiqueta, *fila])
+    else:
+        for fila in filas:
+            hoja.append(fila)
+
 def solicitar_input_seguro(mensaje, tipo=str, validacion=None, mensaje_error=None):
     """
     Solicita input al usuario y lo convierte al tipo especificado, con validación opcional.
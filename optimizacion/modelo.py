@@ -52,7 +52,7 @@ def construir_modelo(demanda_df, ofertas_df):
         demanda_dict[(fecha, hora)] = row['DEMANDA']
     
     # Filtrar solo las ofertas que tienen EVALUACIÓN = 1
-    ofertas_validas_df = ofertas_df[ofertas_df['EVALUACIÓN'] == 1].copy()
+    ofertas_validas_df = ofertas_df[ofertas_df['EVALUACIÓN'] == 1]
     
     # Crear diccionarios para almacenar precios, cantidades y combinaciones válidas
     precio_dict = {}